@@ -1,14 +1,173 @@
 # agents/dependency_extraction_agent.py
 import subprocess
 import os
-import json
+import hashlib
 import logging
+import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+from agents.fs_utils import ensure_dir, write_bytes_atomic
+
+try:
+    import ijson
+except ImportError:  # Without ijson, container output is buffered and parsed in one go
+    ijson = None
+
+try:
+    import simdjson
+except ImportError:  # Fall back to the stdlib parser when the C extension is unavailable
+    simdjson = None
 
 # Configure logging
-logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.DEBUG)
+logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=os.environ.get("LOGLEVEL", "INFO").upper())
 
 SUPPORTED_LANGUAGES = ["python", "javascript", "java"]  # Expand as needed
 
+# Exit code of the Python extraction script when pipdeptree succeeded but
+# `pip install -r requirements.txt` failed, so the tree may be incomplete
+PIP_INSTALL_FAILED_EXIT_CODE = 86
+
+# Exit code of `docker run` when Docker itself failed to start the container
+# (e.g. the image was removed), as opposed to the command failing inside it
+DOCKER_RUN_FAILED_EXIT_CODE = 125
+
+# Files whose contents determine the resolved dependency tree, per language
+LOCKFILES = {
+    "python": ("requirements.txt",),
+    "javascript": ("package.json", "package-lock.json"),
+    "java": ("pom.xml",),
+}
+
+# JSON array types returned by `_parse_json`
+JSON_ARRAY_TYPES = (list, simdjson.Array) if simdjson else (list,)
+
+# Errors raised on invalid or truncated JSON (orjson and simdjson raise ValueErrors,
+# ijson's JSONError does not subclass ValueError)
+JSON_ERRORS = (ValueError, ijson.JSONError) if ijson else (ValueError,)
+
+
+def _parse_json(raw: bytes):
+    """
+    Parses a JSON document with simdjson On-Demand when available.
+    Nodes are materialized lazily as they are accessed, so only the fields
+    we actually read are converted to Python objects.
+    """
+    if simdjson is not None:
+        return simdjson.Parser().parse(raw)
+    return orjson.loads(raw)
+
+
+def _iter_json_array(stream):
+    """
+    Yields the elements of the top-level JSON array read from the binary
+    `stream`. With ijson each element is yielded as soon as it has been read.
+    """
+    if ijson is not None:
+        return ijson.items(stream, "item")
+
+    data = _parse_json(stream.read())
+    if not isinstance(data, JSON_ARRAY_TYPES):
+        raise ValueError("Expected a JSON array.")
+    return iter(data)
+
+
+def _iter_json_members(stream, key: str):
+    """
+    Yields the (name, value) pairs of the `key` object of the top-level JSON
+    object read from the binary `stream`, as they are read when ijson is available.
+    """
+    if ijson is not None:
+        return ijson.kvitems(stream, key)
+
+    data = _parse_json(stream.read())
+    return iter(data[key].items()) if key in data else iter(())
+
+
+class _TeeReader:
+    """Binary file-like wrapper that copies everything read from `stream` into `sink`."""
+
+    def __init__(self, stream, sink):
+        self.stream = stream
+        self.sink = sink
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.sink.write(data)
+        return data
+
+
+class DependencyExtractionPool:
+    """
+    A long-lived runtime container for batch extraction over many repositories.
+
+    The container is started once; each repository is copied into /repos and
+    extraction commands run through `docker exec`, so the container startup cost
+    is paid once per batch instead of once per repository.
+
+    Usage:
+        with DependencyExtractionPool() as pool:
+            for repo in repos:
+                DependencyExtractionAgent(language, repo, pool=pool).run()
+    """
+
+    def __init__(self, docker_image: str = "multi-agent-runtime", name: str = "multi-agent-pool"):
+        """
+        :param docker_image: The Docker image name that has all the tools installed
+        :param name: Name of the long-lived container
+        """
+        self.docker_image = docker_image
+        self.name = name
+        self._workdirs = {}  # Host repo path -> path of its copy inside the container
+        self._lock = threading.Lock()  # Extractions for several languages may share a repo copy
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self) -> None:
+        """Starts the container; the image's default CMD keeps it alive."""
+        logging.info("🐳 Starting warm container '%s' from image '%s'...", self.name, self.docker_image)
+        subprocess.run(
+            ["docker", "run", "-d", "--rm", "--name", self.name, self.docker_image],
+            stdout=subprocess.DEVNULL,
+            check=True
+        )
+
+    def stop(self) -> None:
+        """Stops and removes the container."""
+        subprocess.run(
+            ["docker", "rm", "-f", self.name],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self._workdirs.clear()
+
+    def exec_cmd(self, repo_path: str, command: list) -> list:
+        """
+        Returns the `docker exec` invocation that runs `command` against a copy
+        of `repo_path`, copying the repository into the container on first use.
+        """
+        with self._lock:
+            workdir = self._workdirs.get(repo_path)
+            if workdir is None:
+                digest = hashlib.blake2b(repo_path.encode(), digest_size=6).hexdigest()
+                workdir = f"/repos/{os.path.basename(repo_path)}-{digest}"
+                subprocess.run(
+                    ["docker", "cp", f"{repo_path}/.", f"{self.name}:{workdir}"],
+                    stdout=subprocess.DEVNULL,
+                    check=True
+                )
+                self._workdirs[repo_path] = workdir
+
+        return ["docker", "exec", "-w", workdir, self.name, *command]
+
+
 class DependencyExtractionAgent:
     """
     Executes dependency extraction commands in a Docker container that
@@ -18,199 +177,324 @@ class DependencyExtractionAgent:
     is done inside Docker.
     """
 
-    def __init__(self, language: str, repo_path: str, docker_image: str = "multi-agent-runtime"):
+    def __init__(
+        self,
+        language: str | list,
+        repo_path: str | os.PathLike,
+        docker_image: str = "multi-agent-runtime",
+        pool: DependencyExtractionPool = None
+    ):
         """
-        :param language: The detected language (e.g., 'python', 'javascript')
+        :param language: The detected language (e.g., 'python', 'javascript'), or a
+            list of languages for repositories that mix several ecosystems
         :param repo_path: Absolute path to the local repository on the host
         :param docker_image: The Docker image name that has all the tools installed
+        :param pool: Optional warm container to `docker exec` into instead of
+            starting a fresh container per command
         """
-        self.language = language.lower()
+        languages = [language] if isinstance(language, str) else language
+        self.languages = [lang.lower() for lang in languages]
         self.repo_path = os.path.abspath(repo_path)
         self.docker_image = docker_image
+        self.pool = pool
 
-        # Ensure .shed directory exists
-        self.shed_dir = os.path.join(self.repo_path, ".shed")
-        os.makedirs(self.shed_dir, exist_ok=True)
+        # Ensure .shed directory exists (once per repo, not per instance)
+        self.shed_dir = ensure_dir(os.path.join(self.repo_path, ".shed"))
 
-        if self.language not in SUPPORTED_LANGUAGES:
-            raise ValueError(f"❌ Unsupported language {self.language}")
+        for lang in self.languages:
+            if lang not in SUPPORTED_LANGUAGES:
+                raise ValueError(f"❌ Unsupported language {lang}")
 
     def run(self):
         """
-        Executes language-specific commands in a fresh Docker container.
+        Executes language-specific commands in a fresh Docker container
+        (or in the warm pool container, if one was provided).
+
+        When several languages were requested, each extraction runs in its own
+        container concurrently and the results are merged.
         """
-        logging.info(f"🐳 Running dependency extraction for {self.language} in Docker image '{self.docker_image}'...")
-
-        if self.language == "python":
-            return self._extract_python()
-        elif self.language == "javascript":
-            return self._extract_javascript()
-        elif self.language == "java":
-            return self._extract_java()
+        if len(self.languages) == 1:
+            return self._extract(self.languages[0])
+
+        # Each extraction mostly waits on its own `docker` subprocess, so threads
+        # run them in parallel without contending on the GIL
+        with ThreadPoolExecutor(max_workers=len(self.languages)) as executor:
+            results = list(executor.map(self._extract, self.languages))
+
+        merged = {"dependencies": []}
+        for result in results:
+            merged["dependencies"].extend(result["dependencies"])
+        return merged
+
+    def _extract(self, language: str) -> dict:
+        """
+        Runs the extraction for a single language, reusing the cached result
+        from `.shed/deps_cache` when the language's lockfiles are unchanged.
+        """
+        cache_path = self._cache_path(language)
+        if cache_path and os.path.exists(cache_path):
+            logging.info("♻️ Reusing cached %s dependencies from %s", language, cache_path)
+            with open(cache_path, "rb") as f:
+                return orjson.loads(f.read())
+
+        logging.info("🐳 Running dependency extraction for %s in Docker image '%s'...", language, self.docker_image)
+
+        if language == "python":
+            result = self._extract_python()
+        elif language == "javascript":
+            result = self._extract_javascript()
+        elif language == "java":
+            result = self._extract_java()
         else:
             # Should never happen if SUPPORTED_LANGUAGES is correct
             return {"dependencies": []}
 
-    def _extract_python(self) -> dict:
+        # Failed or incomplete extractions are not cached
+        if cache_path and result["dependencies"] and not result.get("incomplete"):
+            self._write_cache(cache_path, result)
+        return result
+
+    def _cache_path(self, language: str) -> str | None:
         """
-        Extract Python dependencies by mounting the repo at /app in a container 
-        that has Python + pipdeptree.
+        Returns the cache file for `language`, named after a BLAKE2b hash of the
+        repository's lockfiles, or None when the repository has none of them.
         """
-        logging.info("📦 Running Python dependency extraction with Docker...")
+        digest = hashlib.blake2b()
+        found = False
+        for name in LOCKFILES[language]:
+            try:
+                with open(os.path.join(self.repo_path, name), "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                continue
+            digest.update(name.encode())
+            digest.update(content)
+            found = True
+
+        if not found:
+            return None
+        return os.path.join(self.shed_dir, "deps_cache", f"{language}-{digest.hexdigest()[:16]}.json")
+
+    def _write_cache(self, cache_path: str, result: dict) -> None:
+        """Atomically writes an extraction result to `cache_path`."""
+        write_bytes_atomic(cache_path, orjson.dumps(result))
+
+    def _run_streaming(self, cmd: list, parse, output_filename: str) -> tuple:
+        """
+        Runs `cmd` and hands its stdout pipe to `parse` while the command is
+        still producing output, so large JSON documents are never buffered in
+        full. Returns `(parsed, returncode, stderr)`.
+
+        The raw output is also copied to `.shed/<output_filename>` as it is read,
+        for downstream tools; it is never read back by this agent. If `parse`
+        raises, a failed command's stderr is logged before the error propagates.
+        """
+        # stderr goes to a temporary file so a chatty install can't fill a pipe
+        # and stall the process while we are reading stdout
+        output_path = os.path.join(self.shed_dir, output_filename)
+        with tempfile.TemporaryFile() as stderr_file, open(output_path, "wb") as output_file:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+            parse_error = None
+            try:
+                parsed = parse(_TeeReader(proc.stdout, output_file))
+            except Exception as e:
+                parse_error = e
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors="replace")
+
+        if parse_error is not None:
+            if returncode != 0:
+                logging.error("❌ Command failed with exit code %s:\n%s", returncode, stderr)
+            raise parse_error
+        return parsed, returncode, stderr
+
+    def _check_docker_run(self, returncode: int, stderr: str) -> None:
+        """
+        Raises a RuntimeError when Docker could not start the extraction
+        container, so a missing image fails the run instead of yielding no
+        dependencies.
+        """
+        if returncode == DOCKER_RUN_FAILED_EXIT_CODE:
+            raise RuntimeError(f"Docker could not run image '{self.docker_image}':\n{stderr.strip()}")
+
+    def _docker_cmd(self, command: list) -> list:
+        """
+        Builds the Docker invocation that runs `command` with the repository
+        as its working directory.
+        """
+        if self.pool is not None:
+            return self.pool.exec_cmd(self.repo_path, command)
 
-        cmd = [
+        return [
             "docker", "run", "--rm",
             "-v", f"{self.repo_path}:/app",
             "-w", "/app",
             self.docker_image,
-            "bash", "-c",
-            (
-                # Ensure pipdeptree is installed in the container
-                "pip install --quiet pipdeptree && "
-                # Attempt installing dependencies from requirements.txt if present
-                "pip install --quiet -r requirements.txt || true && "
-                # Then run pipdeptree, output JSON to .shed/deps.json
-                "pipdeptree --json-tree > .shed/deps.json"
-            )
+            *command
         ]
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        # Log anything that came from the container
-        if result.stdout:
-            logging.info(f"[Docker STDOUT]\n{result.stdout}")
-        if result.stderr:
-            logging.warning(f"[Docker STDERR]\n{result.stderr}")
+    def _extract_python(self) -> dict:
+        """
+        Extract Python dependencies by mounting the repo at /app in a container
+        that has Python + pipdeptree. The JSON tree is parsed straight from the
+        container's stdout rather than round-tripping through a file.
+
+        The mount is writable because requirements such as `-e .`, local paths or
+        `-e git+...` build or check out into the source tree. If installing the
+        requirements fails, the (possibly incomplete) tree is still returned but
+        marked `incomplete`, so it is not cached.
+        """
+        logging.info("📦 Running Python dependency extraction with Docker...")
 
-        if result.returncode != 0:
+        # pipdeptree is baked into the runtime image, so only the project's
+        # requirements are installed here (if present)
+        install = (
+            "pip_status=0; "
+            "if [ -f requirements.txt ]; then pip install --quiet -r requirements.txt >&2 || pip_status=$?; fi; "
+        )
+        # Then run pipdeptree; its JSON is the only thing written to stdout
+        pipdeptree = "pipdeptree --json-tree"
+        if self.pool is not None:
+            # The pool container is shared across repositories, so install into a
+            # per-repository virtualenv and point pipdeptree at its interpreter
+            install = "python3 -m venv .shed/venv >&2 && . .shed/venv/bin/activate && " + install
+            pipdeptree = "pipdeptree --python .shed/venv/bin/python --json-tree"
+        script = (
+            f"{install}{pipdeptree} || exit $?; "
+            f"[ $pip_status -eq 0 ] || exit {PIP_INSTALL_FAILED_EXIT_CODE}"
+        )
+
+        cmd = self._docker_cmd(["bash", "-c", script])
+
+        parsed, returncode, stderr = self._run_streaming(cmd, self._parse_pipdeptree, "deps.json")
+        self._check_docker_run(returncode, stderr)
+
+        # Log anything the container reported on stderr
+        if stderr:
+            logging.warning("[Docker STDERR]\n%s", stderr)
+
+        if returncode == PIP_INSTALL_FAILED_EXIT_CODE:
+            logging.error("❌ Installing requirements.txt failed, the Python dependency tree may be incomplete.")
+            return {**parsed, "incomplete": True}
+        if returncode != 0:
             logging.error("❌ Python dependency extraction command failed.")
             return {"dependencies": []}
 
-        # Attempt to parse the newly created .shed/deps.json
-        return self._parse_python_deps()
+        return parsed
 
-
-    def _parse_python_deps(self) -> dict:
-        deps_json_path = os.path.join(self.shed_dir, "deps.json")
-        if not os.path.exists(deps_json_path):
-            logging.error("❌ deps.json file not found after Python extraction.")
-            return {"dependencies": []}
-
-        with open(deps_json_path, "r") as f:
-            deps_raw = f.read()
-
-        return {"dependencies": self._parse_pipdeptree(deps_raw)}
-
-    def _parse_pipdeptree(self, deps_json: str):
+    def _parse_pipdeptree(self, stream) -> dict:
         """
-        Parses the JSON output from `pipdeptree` and extracts dependencies.
+        Parses the JSON output from `pipdeptree` (a binary stream) and extracts
+        dependencies, walking each top-level package as soon as it has been read.
         Ensures correct transitivity marking and handles duplicate versions.
         """
         try:
-            logging.debug(f"🔍 Raw pipdeptree JSON (first 500 chars): {deps_json[:500]}")
-            data = json.loads(deps_json)
-
-            if not isinstance(data, list):
-                logging.error("❌ Unexpected JSON format from pipdeptree: expected a list.")
-                return []
-
             # Flattened dependency list with unique keys
             dependency_map = {}
-
-            def traverse_deps(dep_obj, is_transitive):
-                """Recursively extract dependencies while tracking transitivity."""
-                package_name = dep_obj.get("package_name") or dep_obj.get("key", "unknown")
-                installed_version = dep_obj.get("installed_version", "unknown")
-                key = package_name.lower()  # Normalize case
-
-                # Ensure package is uniquely stored
-                if key in dependency_map:
-                    if installed_version not in dependency_map[key]["installed_versions"]:
-                        dependency_map[key]["installed_versions"].append(installed_version)
-                else:
-                    dependency_map[key] = {
-                        "key": key,
-                        "package_name": package_name,
-                        "installed_versions": [installed_version],
-                        "is_transitive": is_transitive  # Set transitivity correctly
-                    }
-
-                # Process child dependencies
-                for sub_dep in dep_obj.get("dependencies", []):
-                    traverse_deps(sub_dep, is_transitive=True)  # Children are always transitive
-
-            # Traverse each top-level dependency (non-transitive)
-            for dep in data:
-                traverse_deps(dep, is_transitive=False)
-
-            # Convert map to sorted list
+            # (key, version) pairs whose subtree has already been walked
+            visited = set()
+
+            # Walk the tree with an explicit stack (children pushed in reverse to keep
+            # depth-first pre-order); top-level dependencies are non-transitive
+            stack = deque()
+            for top_level_dep in _iter_json_array(stream):
+                stack.append((top_level_dep, False))
+                while stack:
+                    dep_obj, is_transitive = stack.pop()
+                    package_name = sys.intern(dep_obj.get("package_name") or dep_obj.get("key", "unknown"))
+                    installed_version = dep_obj.get("installed_version", "unknown")
+                    key = sys.intern(package_name.lower())  # Normalize case
+
+                    # Ensure package is uniquely stored; versions are collected in a set
+                    if key in dependency_map:
+                        dependency_map[key]["installed_versions"].add(installed_version)
+                    else:
+                        dependency_map[key] = {
+                            "key": key,
+                            "package_name": package_name,
+                            "installed_versions": {installed_version},
+                            "is_transitive": is_transitive  # Set transitivity correctly
+                        }
+
+                    # Shared subtrees (e.g. botocore under boto3 and s3transfer) are only walked once
+                    if (key, installed_version) in visited:
+                        continue
+                    visited.add((key, installed_version))
+
+                    # Queue child dependencies (children are always transitive)
+                    stack.extend((sub_dep, True) for sub_dep in reversed(dep_obj.get("dependencies", ())))
+
+            # Convert map to sorted list (with sorted version lists)
             result = sorted(dependency_map.values(), key=lambda x: x["package_name"])
-            logging.info(f"✅ Extracted {len(result)} unique dependencies.")
-            return result
+            for dep in result:
+                dep["installed_versions"] = sorted(dep["installed_versions"])
+            logging.info("✅ Extracted %s unique dependencies.", len(result))
+            return {"dependencies": result}
 
-        except json.JSONDecodeError:
+        except JSON_ERRORS:
             logging.error("❌ Failed to parse pipdeptree JSON output. Not valid JSON.")
-            return []
+            return {"dependencies": []}
 
     def _extract_javascript(self) -> dict:
         """
         Extract JavaScript dependencies in a container that has Node.js installed.
+        The tree is read from package-lock.json, so no packages are downloaded.
         """
         logging.info("📦 Running JavaScript dependency extraction with Docker...")
 
-        cmd = [
-            "docker", "run", "--rm",
-            "-v", f"{self.repo_path}:/app",
-            "-w", "/app",
-            self.docker_image,
+        cmd = self._docker_cmd([
             "sh", "-c",
             (
-                "npm install --quiet || true && "
-                "npm list --json --all > .shed/npm-list.json"
+                # Repos without a lockfile get one resolved (metadata only, no install)
+                "{ [ -f package-lock.json ] || "
+                "npm install --package-lock-only --ignore-scripts --no-audit --no-fund >&2 || true; } && "
+                "npm list --package-lock-only --json --all"
             )
-        ]
+        ])
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            logging.error(f"❌ JavaScript dependency extraction failed:\n{result.stderr}")
+        parsed, returncode, stderr = self._run_streaming(cmd, self._parse_npm_list, "npm-list.json")
+        self._check_docker_run(returncode, stderr)
+        if returncode != 0:
+            logging.error("❌ JavaScript dependency extraction failed:\n%s", stderr)
             return {"dependencies": []}
 
-        return self._parse_js_deps()
-
-    def _parse_js_deps(self) -> dict:
-        npm_list_path = os.path.join(self.shed_dir, "npm-list.json")
-        if not os.path.exists(npm_list_path):
-            logging.error("❌ npm-list.json file not found after JS extraction.")
-            return {"dependencies": []}
-
-        with open(npm_list_path, "r") as f:
-            npm_data = f.read()
-
-        return {"dependencies": self._parse_npm_list(npm_data)}
+        return parsed
 
-    def _parse_npm_list(self, stdout: str) -> list:
+    def _parse_npm_list(self, stream, compact: bool = True) -> dict:
         """
-        Flatten the structure returned by 'npm list --json --all'.
+        Flatten the structure returned by 'npm list --json --all' (a binary
+        stream), walking each top-level dependency as soon as it has been read.
+
+        With `compact` (the default), `dependencies` lists each name/version
+        pair once instead of once per occurrence in the tree.
         """
         try:
-            data = json.loads(stdout)
             flattened = []
-
-            def traverse(deps):
-                for name, info in deps.items():
+            seen = set()
+
+            # (name, info) pairs, walked depth-first with an explicit stack
+            stack = deque()
+            for top_level_name, top_level_info in _iter_json_members(stream, "dependencies"):
+                stack.append((top_level_name, top_level_info))
+                while stack:
+                    name, info = stack.pop()
                     version = info.get("version", "unknown")
-                    flattened.append({"name": name, "version": version})
-                    if "dependencies" in info:
-                        traverse(info["dependencies"])
+                    if not compact or (name, version) not in seen:
+                        seen.add((name, version))
+                        flattened.append({"name": name, "version": version})
 
-            if "dependencies" in data:
-                traverse(data["dependencies"])
+                    if "dependencies" in info:
+                        stack.extend(reversed(list(info["dependencies"].items())))
 
-            logging.info(f"✅ Extracted {len(flattened)} JavaScript dependencies.")
-            return flattened
-        except json.JSONDecodeError:
+            logging.info("✅ Extracted %s JavaScript dependencies.", len(flattened))
+            return {"dependencies": flattened}
+        except JSON_ERRORS:
             logging.error("❌ Failed to parse npm JSON output.")
-            return []
+            return {"dependencies": []}
 
     def _extract_java(self) -> dict:
         """
@@ -218,42 +502,47 @@ class DependencyExtractionAgent:
         """
         logging.info("📦 Running Java dependency extraction with Docker...")
 
-        cmd = [
-            "docker", "run", "--rm",
-            "-v", f"{self.repo_path}:/app",
-            "-w", "/app",
-            self.docker_image,
-            "mvn", "dependency:tree", "-DoutputType=tgf", "-DoutputFile=.shed/maven-deps.tgf"
-        ]
+        cmd = self._docker_cmd([
+            "sh", "-c",
+            (
+                # Maven logs go to stderr; the TGF tree is printed to stdout from
+                # inside the container so it can be read without the bind mount
+                "mvn dependency:tree -DoutputType=tgf -DoutputFile=.shed/maven-deps.tgf >&2 && "
+                "cat .shed/maven-deps.tgf"
+            )
+        ])
 
         result = subprocess.run(cmd, capture_output=True, text=True)
+        self._check_docker_run(result.returncode, result.stderr)
         if result.returncode != 0:
-            logging.error(f"❌ Java dependency extraction failed:\n{result.stderr}")
-            return {"dependencies": []}
-
-        return self._parse_maven_deps()
-
-    def _parse_maven_deps(self) -> dict:
-        maven_output_path = os.path.join(self.shed_dir, "maven-deps.tgf")
-        if not os.path.exists(maven_output_path):
-            logging.error("❌ maven-deps.tgf not found after Java extraction.")
+            logging.error("❌ Java dependency extraction failed:\n%s", result.stderr)
             return {"dependencies": []}
 
-        with open(maven_output_path, "r") as f:
-            maven_data = f.read()
-        return {"dependencies": self._parse_maven_tree(maven_data)}
+        return {"dependencies": self._parse_maven_tree(result.stdout)}
 
     def _parse_maven_tree(self, stdout: str) -> list:
         """
         The TGF output from Maven can be parsed or flattened here.
+
+        Node lines look like `<id> <group>:<artifact>:<type>:<version>[:<scope>]`,
+        or `<id> <group>:<artifact>:<type>:<classifier>:<version>:<scope>` for
+        classified artifacts; the edge section that follows the `#` separator
+        line is skipped.
         """
-        lines = stdout.strip().split("\n")
+        # Split on the separator *line* only, so a '#' inside a node label can't cut the block short
+        nodes_block, _, _ = stdout.partition("\n#\n")
         flattened = []
 
-        for line in lines:
-            parts = line.split()
-            if len(parts) >= 2:
-                flattened.append({"name": parts[1], "version": "unknown"})
+        for line in nodes_block.splitlines():
+            _, sep, rest = line.partition(" ")
+            if not sep or not rest:
+                continue
+
+            coordinate = rest.partition(" ")[0]
+            parts = coordinate.split(":")
+            if len(parts) >= 4:
+                version = parts[4] if len(parts) >= 6 else parts[3]
+                flattened.append({"name": f"{parts[0]}:{parts[1]}", "version": version})
 
-        logging.info(f"✅ Extracted {len(flattened)} Java dependencies.")
+        logging.info("✅ Extracted %s Java dependencies.", len(flattened))
         return flattened
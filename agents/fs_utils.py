@@ -0,0 +1,25 @@
+import functools
+import os
+
+
+@functools.lru_cache(maxsize=None)
+def ensure_dir(path: str) -> str:
+    """
+    Creates `path` (and its parents) if needed and returns it. Memoized, so
+    each directory is only checked once per process.
+    """
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_bytes_atomic(path: str | os.PathLike, data: bytes) -> None:
+    """
+    Writes `data` to `path` in a single write through a temporary file that
+    replaces `path`, so readers never see a partially written file.
+    """
+    path = os.fspath(path)
+    ensure_dir(os.path.dirname(path) or ".")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -1,47 +1,141 @@
 import os
+import queue
 import logging
-from pygments.lexers import get_lexer_for_filename
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pygments.lexers import get_all_lexers, get_lexer_for_filename
 from pygments.util import ClassNotFound
 
-EXCLUDED_FOLDERS = {".venv", "venv", "node_modules", "target", "build", "__pycache__", "dist"}
+EXCLUDED_FOLDERS = {".git", ".venv", "venv", "node_modules", "target", "build", "__pycache__", "dist"}
+
+
+def _build_ext_map() -> dict:
+    """
+    Maps file extensions to lexer names using only the Pygments registry
+    metadata, so no lexer class is loaded. Extensions claimed by several
+    lexers (e.g. `.m`) are left out; Pygments' own priority rules pick
+    between those on first lookup.
+    """
+    ext_map = {}
+    ambiguous = set()
+    for name, _, patterns, _ in get_all_lexers():
+        for pattern in patterns:
+            ext = pattern[1:]
+            # Only plain lowercase `*.ext` patterns (scanned extensions are lowercased
+            # and Pygments matches case-sensitively), not globs such as `*.[ch]`
+            # or multi-part suffixes such as `*.tar.gz`
+            if not pattern.startswith("*.") or ext != ext.lower() or any(c in ext[1:] for c in "*?[."):
+                continue
+            if ext_map.setdefault(ext, name) != name:
+                ambiguous.add(ext)
+
+    for ext in ambiguous:
+        del ext_map[ext]
+    return ext_map
+
+
+# Extension -> Pygments lexer name (None when no lexer matches). Prebuilt from
+# the registry at import time; other extensions are resolved on first lookup.
+_EXT_MAP: dict[str, str | None] = _build_ext_map()
+
+
+def _scan_dir(path: str, extension_counts: Counter) -> list:
+    """
+    Counts file extensions directly inside `path` into `extension_counts`
+    and returns the subdirectories that should be walked next. Directories
+    that can't be read are skipped, as `os.walk` does.
+    """
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    # ✅ Prune excluded directories before descending into them
+                    if entry.name not in EXCLUDED_FOLDERS:
+                        subdirs.append(entry.path)
+                    continue
+
+                base, dot, ext = entry.name.rpartition(".")
+                if not dot or not base:  # No extension, or a dotfile like .gitignore
+                    continue
+                ext = f".{ext.lower()}"
+                if ext not in {".sample", ".dockerfile"}:  # Exclude unrecognized extensions
+                    extension_counts[ext] += 1
+    except OSError as e:
+        logging.warning("⚠️ Skipping unreadable directory %s: %s", path, e)
+    return subdirs
+
+
+def _walk_and_count_parallel(paths: list, max_workers: int) -> Counter:
+    """
+    Walks the directory trees rooted at `paths` with `max_workers` threads
+    pulling directories from a shared queue, so deep single-directory trees
+    (e.g. a monorepo's `src/`) are spread across workers too. Each worker
+    counts into its own Counter; they are summed at the end, so no lock is needed.
+    """
+    pending_dirs = queue.Queue()
+    for path in paths:
+        pending_dirs.put(path)
+
+    def worker() -> Counter:
+        extension_counts = Counter()
+        while (path := pending_dirs.get()) is not None:
+            try:
+                for subdir in _scan_dir(path, extension_counts):
+                    pending_dirs.put(subdir)
+            finally:
+                pending_dirs.task_done()
+        return extension_counts
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        workers = [executor.submit(worker) for _ in range(max_workers)]
+        pending_dirs.join()  # Every directory scanned, including ones queued by workers
+        for _ in workers:
+            pending_dirs.put(None)
+        return sum((future.result() for future in workers), Counter())
+
 
 class LanguageDetectionAgent:
-    def __init__(self, repo_path: str):
-        self.repo_path = repo_path
+    def __init__(self, repo_path: str | os.PathLike):
+        self.repo_path = os.fspath(repo_path)
 
     def run(self):
-        logging.info(f"🔎 Scanning repository: {self.repo_path}")
+        logging.info("🔎 Scanning repository: %s", self.repo_path)
 
-        file_extensions = []
-        for root, _, files in os.walk(self.repo_path):
-            # ✅ Skip excluded directories
-            if any(excluded in root for excluded in EXCLUDED_FOLDERS):
-                continue
+        # Count files at the top level here; subdirectories are walked separately
+        extension_counts = Counter()
+        top_level_dirs = _scan_dir(self.repo_path, extension_counts)
 
-            for file in files:
-                ext = os.path.splitext(file)[-1].lower()
-                if ext and ext not in {".sample", ".dockerfile"}:  # Exclude unrecognized extensions
-                    file_extensions.append(ext)
+        if top_level_dirs:
+            # Directory scanning is I/O bound, so threads overlap the stat() latency
+            max_workers = min(32, (os.cpu_count() or 1) * 4)
+            extension_counts.update(_walk_and_count_parallel(top_level_dirs, max_workers))
 
-        if not file_extensions:
+        if not extension_counts:
             logging.error("❌ No source code files found in the repository.")
             raise ValueError("No code files found.")
 
-        logging.info(f"📂 Found {len(file_extensions)} files, trying to determine language...")
+        logging.info("📂 Found %s files, trying to determine language...", extension_counts.total())
 
-        language_guesses = []
-        for ext in file_extensions:
-            try:
-                lexer = get_lexer_for_filename(f"dummy{ext}")
-                language_guesses.append(lexer.name)
-            except ClassNotFound:
-                logging.warning(f"⚠️ No lexer found for extension {ext}")
+        # Each unique extension is resolved once and weighted by its file count
+        language_counts = Counter()
+        for ext, count in extension_counts.items():
+            if ext not in _EXT_MAP:
+                try:
+                    _EXT_MAP[ext] = get_lexer_for_filename(f"dummy{ext}").name
+                except ClassNotFound:
+                    logging.warning("⚠️ No lexer found for extension %s", ext)
+                    _EXT_MAP[ext] = None
+
+            lang = _EXT_MAP[ext]
+            if lang:
+                language_counts[lang] += count
 
-        if not language_guesses:
+        if not language_counts:
             logging.error("❌ Could not determine language.")
             raise ValueError("Language detection failed.")
 
-        dominant_language = max(set(language_guesses), key=language_guesses.count)
-        logging.info(f"✅ Detected language: {dominant_language}")
+        dominant_language = language_counts.most_common(1)[0][0]
+        logging.info("✅ Detected language: %s", dominant_language)
 
         return {"language": dominant_language.lower(), "repoPath": self.repo_path}
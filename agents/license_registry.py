@@ -0,0 +1,147 @@
+import re
+import logging
+
+import httpx
+
+# SPDX identifiers of common OSI-approved / open-source licenses
+OPEN_SOURCE_LICENSES = {
+    "0BSD", "AFL-3.0", "AGPL-3.0", "AGPL-3.0-only", "AGPL-3.0-or-later", "Apache-1.1", "Apache-2.0",
+    "Artistic-2.0", "BlueOak-1.0.0", "BSD-2-Clause", "BSD-3-Clause", "BSL-1.0", "CC0-1.0",
+    "CDDL-1.0", "EPL-1.0", "EPL-2.0", "EUPL-1.2", "GPL-2.0", "GPL-2.0-only", "GPL-2.0-or-later",
+    "GPL-3.0", "GPL-3.0-only", "GPL-3.0-or-later", "HPND", "ISC", "LGPL-2.1", "LGPL-2.1-only",
+    "LGPL-2.1-or-later", "LGPL-3.0", "LGPL-3.0-only", "LGPL-3.0-or-later", "MIT", "MIT-0",
+    "MPL-2.0", "OFL-1.1", "PSF-2.0", "Python-2.0", "Unlicense", "UPL-1.0", "WTFPL", "Zlib",
+}
+
+# Common free-form license strings (PyPI `license` fields and trove classifiers) -> SPDX.
+# Names that don't pin a variant ("BSD License", "Apache Software License") are left unmapped.
+LICENSE_ALIASES = {
+    "mit": "MIT",
+    "mit license": "MIT",
+    "apache 2.0": "Apache-2.0",
+    "apache-2": "Apache-2.0",
+    "apache license 2.0": "Apache-2.0",
+    "apache license, version 2.0": "Apache-2.0",
+    "new bsd license": "BSD-3-Clause",
+    "3-clause bsd license": "BSD-3-Clause",
+    "isc license": "ISC",
+    "isc license (iscl)": "ISC",
+    "mozilla public license 2.0 (mpl 2.0)": "MPL-2.0",
+    "gnu general public license v2 (gplv2)": "GPL-2.0-only",
+    "gnu general public license v3 (gplv3)": "GPL-3.0-only",
+    "gnu lesser general public license v2 or later (lgplv2+)": "LGPL-2.1-or-later",
+    "gnu lesser general public license v3 (lgplv3)": "LGPL-3.0-only",
+    "python software foundation license": "PSF-2.0",
+    "psf": "PSF-2.0",
+    "the unlicense (unlicense)": "Unlicense",
+}
+
+# Canonical license page per SPDX identifier, keyed in upper case for case-insensitive lookups
+SPDX_URLS = {
+    license_id.upper(): f"https://spdx.org/licenses/{license_id}.html"
+    for license_id in OPEN_SOURCE_LICENSES
+}
+
+# Registry metadata endpoints per detected language, for a single release: the
+# full PyPI listing and npm packument carry every release (many MB for popular packages)
+REGISTRY_URLS = {
+    "python": "https://pypi.org/pypi/{package}/{version}/json",
+    "javascript": "https://registry.npmjs.org/{package}/{version}",
+}
+
+# Endpoints used when the installed version is unknown (PyPI has no per-release
+# alias for the latest version)
+LATEST_REGISTRY_URLS = {
+    "python": "https://pypi.org/pypi/{package}/json",
+    "javascript": "https://registry.npmjs.org/{package}/latest",
+}
+
+
+def to_spdx(license_name: str) -> str:
+    """Normalizes a free-form license name to its SPDX identifier when it is a known alias."""
+    return LICENSE_ALIASES.get(license_name.strip().lower(), license_name.strip())
+
+
+def license_url(license_name: str, default=None):
+    """
+    Returns the SPDX license page for a single known license name or SPDX
+    identifier, else `default`.
+    """
+    return SPDX_URLS.get(to_spdx(license_name).upper(), default)
+
+
+def is_open_source_expression(expression: str) -> bool:
+    """
+    Returns True when every license in an SPDX expression such as
+    `MIT OR Apache-2.0` is a known open-source license.
+    """
+    ids = [
+        part.split(" WITH ")[0].strip()
+        for part in re.split(r"\s+(?:OR|AND)\s+|[()]", expression)
+        if part.strip()
+    ]
+    return bool(ids) and all(license_id in OPEN_SOURCE_LICENSES for license_id in ids)
+
+
+def _license_from_pypi(data: dict):
+    info = data.get("info") or {}
+    # PEP 639 `license_expression` is already SPDX; `license` is free text (sometimes the full
+    # license, or placeholders like "UNKNOWN"), so fall through to the classifiers when unrecognised
+    candidates = [
+        value for value in (info.get("license_expression"), info.get("license"))
+        if value and "\n" not in value and len(value) <= 100
+    ]
+    candidates += [
+        classifier.rsplit(" :: ", 1)[1]
+        for classifier in info.get("classifiers") or []
+        if classifier.startswith("License :: OSI Approved :: ")
+    ]
+    for candidate in candidates:
+        license_name = to_spdx(candidate)
+        if is_open_source_expression(license_name):
+            return license_name
+    return None
+
+
+def _license_from_npm(data: dict):
+    value = data.get("license")
+    if isinstance(value, dict):  # Legacy `{"type": ..., "url": ...}` form
+        value = value.get("type")
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+async def lookup_license(client: httpx.AsyncClient, language: str, package_name: str, version: str = None):
+    """
+    Looks up the declared license of a package in its language's registry
+    (PyPI or npm), for the installed `version` when it is known, else for the
+    latest release. Returns a research result dict when the registry declares
+    a known open-source license, or None so that the caller falls back to web
+    research.
+    """
+    if version and version != "unknown":
+        url_template = REGISTRY_URLS.get(language)
+    else:
+        url_template = LATEST_REGISTRY_URLS.get(language)
+    if url_template is None:
+        return None
+
+    try:
+        response = await client.get(url_template.format(package=package_name, version=version))
+        if response.status_code != 200:
+            return None
+        data = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        logging.warning("⚠️ Registry lookup failed for %s: %s", package_name, e)
+        return None
+
+    license_name = _license_from_pypi(data) if language == "python" else _license_from_npm(data)
+    if not license_name or not is_open_source_expression(license_name):
+        return None
+
+    return {
+        "is_open_source": True,
+        "license": {
+            "name": license_name,
+            "url": license_url(license_name)
+        }
+    }
@@ -0,0 +1,20 @@
+import functools
+import os
+
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+# Load environment variables
+load_dotenv()
+
+# Chat model used by all agents; set SHED_LLM_MODEL (e.g. to "gpt-4") to override
+LLM_MODEL = os.getenv("SHED_LLM_MODEL", "gpt-4o-mini")
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm(model: str = LLM_MODEL) -> ChatOpenAI:
+    """
+    Returns the process-wide chat model client for `model` (temperature 0),
+    created on first use and shared by all agents.
+    """
+    return ChatOpenAI(model=model, temperature=0)
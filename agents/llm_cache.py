@@ -0,0 +1,139 @@
+import io
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np
+
+from agents.fs_utils import ensure_dir, write_bytes_atomic
+
+
+class LLMCache:
+    """
+    A persistent key-value cache for deterministic (temperature=0) LLM and
+    web search results, backed by SQLite.
+
+    Entries older than `ttl` seconds are treated as misses. The cache is safe
+    to share between the threads of a single process.
+    """
+
+    def __init__(self, db_path: str | os.PathLike, ttl: int = 30 * 86400):
+        """
+        :param db_path: Path to the SQLite database file (created if missing)
+        :param ttl: Number of seconds an entry stays valid
+        """
+        self.db_path = db_path = os.fspath(db_path)
+        self.ttl = ttl
+
+        ensure_dir(os.path.dirname(db_path) or ".")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Builds a cache key from the parts that determine a result (model, prompt version, input...)."""
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached value for `key`, or None on a miss or an expired entry."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value) -> None:
+        """Stores a JSON-serializable `value` under `key`."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class SemanticCache:
+    """
+    A nearest-neighbour cache over text embeddings: a lookup returns the result
+    stored for the most similar earlier query when their cosine similarity is
+    above `threshold`. This catches near-duplicate keys (case variants, closely
+    related package names) that an exact-match cache misses.
+
+    Unit-normalized vectors are kept in `<path>.npy` (float32, N x D) and the
+    matching results in `<path>.json`. Both files are replaced atomically; if
+    they don't hold the same number of entries (e.g. after a crash between the
+    two writes), the cache starts out empty.
+    """
+
+    def __init__(self, path: str | os.PathLike, embed, threshold: float = 0.95):
+        """
+        :param path: File path prefix for the vector and result files
+        :param embed: Callable turning a string into an embedding vector
+        :param threshold: Minimum cosine similarity for a hit
+        """
+        path = os.fspath(path)
+        self.vectors_path = f"{path}.npy"
+        self.results_path = f"{path}.json"
+        self.embed = embed
+        self.threshold = threshold
+
+        ensure_dir(os.path.dirname(path) or ".")
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._results = []
+        if os.path.exists(self.vectors_path) and os.path.exists(self.results_path):
+            try:
+                vectors = np.load(self.vectors_path)
+                with open(self.results_path, "r") as f:
+                    results = json.load(f)
+            except (OSError, ValueError):
+                vectors, results = None, None
+            if vectors is not None and vectors.ndim == 2 and len(vectors) == len(results):
+                self._vectors = vectors
+                self._results = results
+
+    def lookup(self, text: str) -> tuple:
+        """
+        Embeds `text` and returns `(result, vector)`, where `result` is None on a
+        miss. Pass `vector` to `add` to store a result without re-embedding.
+        """
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        vector /= np.linalg.norm(vector)
+
+        with self._lock:
+            if self._vectors is None or not len(self._results):
+                return None, vector
+            similarities = self._vectors @ vector
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                return self._results[best], vector
+        return None, vector
+
+    def add(self, vector, result) -> None:
+        """Stores a JSON-serializable `result` for an embedding returned by `lookup`."""
+        with self._lock:
+            row = vector.reshape(1, -1)
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+            self._results.append(result)
+
+            buffer = io.BytesIO()
+            np.save(buffer, self._vectors)
+            write_bytes_atomic(self.vectors_path, buffer.getvalue())
+            write_bytes_atomic(self.results_path, json.dumps(self._results).encode())
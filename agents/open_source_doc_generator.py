@@ -1,43 +1,82 @@
 from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
 from docx.shared import Pt
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from xml.sax.saxutils import escape
+import io
+import logging
 import os
-import json
+import shutil
+import subprocess
+import orjson
 from dotenv import load_dotenv
+from agents.fs_utils import ensure_dir
+
+try:
+    import simdjson
+except ImportError:  # Fall back to the stdlib parser when the C extension is unavailable
+    simdjson = None
 
 # Load environment variables
 load_dotenv()
 
+# WordprocessingML templates for the dependency list, built once
+BODY_XML = f"<w:body {nsdecls('w')}>{{paragraphs}}</w:body>"
+PARAGRAPH_XML = "<w:p><w:r>{texts}</w:r></w:p>"
+TEXT_XML = '<w:t xml:space="preserve">{text}</w:t>'
+LINE_BREAK_XML = "<w:br/>"
+
+# From this many dependencies on, the declaration is written as Markdown and
+# converted to DOCX with pandoc (when installed) instead of built with python-docx
+MARKDOWN_THRESHOLD = 1000
+
 class OpenSourceDocGenerator:
     """
     Generates a DOCX document based on the extracted open-source dependencies.
     """
     
-    def __init__(self, repo_path: str, researcher_output: str, app_name: str):
+    def __init__(self, repo_path: str | os.PathLike, researcher_output: str | os.PathLike, app_name: str):
         """
         :param repo_path: Path to the repository where output files will be saved.
         :param researcher_output: Path to the JSON file containing researched dependency data.
         :param app_name: Name of the application.
         """
-        self.repo_path = repo_path
-        self.researcher_output = researcher_output
+        self.repo_path = os.fspath(repo_path)
+        self.researcher_output = os.fspath(researcher_output)
         self.app_name = app_name
         self.company_name = os.getenv("COMPANY_NAME", "Your Company")  # Load company name from .env
         self.company_email = os.getenv("COMPANY_EMAIL", "contact@company.com")  # Load company email from .env
-        self.shed_dir = os.path.join(repo_path, ".shed")
-        os.makedirs(self.shed_dir, exist_ok=True)
+        self.shed_dir = os.path.join(self.repo_path, ".shed")
+        ensure_dir(self.shed_dir)
         self.doc_filename = os.path.join(self.shed_dir, "open_source_declaration.docx")
+        self.markdown_filename = os.path.join(self.shed_dir, "open_source_declaration.md")
         
     def load_dependencies(self):
         """Loads open-source dependencies from the JSON output of the Web Researcher Agent."""
-        with open(self.researcher_output, "r") as f:
-            dependencies = json.load(f)
-        
-        return [dep for dep in dependencies if dep.get("is_open_source", False)]
+        # Read the file in a single binary read, then parse it in memory
+        with open(self.researcher_output, "rb") as f:
+            raw = f.read()
+
+        if simdjson is None:
+            return [dep for dep in orjson.loads(raw) if dep.get("is_open_source", False)]
+
+        # Walk the array lazily and only materialize the fields rendered in the document
+        parser = simdjson.Parser()
+        return [
+            {
+                "package_name": dep["package_name"],
+                "license": dep["license"].as_dict(),
+                "installed_versions": dep["installed_versions"].as_list(),
+            }
+            for dep in parser.parse(raw)
+            if dep.get("is_open_source", False)
+        ]
     
-    def generate_document(self):
+    def generate_document(self, dependencies=None):
         """Creates a DOCX document with open-source dependency details."""
-        dependencies = self.load_dependencies()
+        if dependencies is None:
+            dependencies = self.load_dependencies()
         
         doc = Document()
         
@@ -78,13 +117,7 @@ class OpenSourceDocGenerator:
         )
         
         doc.add_heading("Open Source Components and Licenses", level=2)
-        
-        for idx, dep in enumerate(dependencies, start=1):
-            doc.add_paragraph(
-                f"{idx}. {dep['package_name']} (License: {dep['license']['name']})"
-            )
-            doc.add_paragraph(f"   - License URL: {dep['license'].get('url', 'N/A')}")
-            doc.add_paragraph(f"   - Versions: {', '.join(dep['installed_versions'])}")
+        self._append_dependency_list(doc, dependencies)
             
         doc.add_heading("How to Obtain Source Code", level=2)
         paragraph = doc.add_paragraph(
@@ -114,8 +147,104 @@ class OpenSourceDocGenerator:
         paragraph.add_run(".")
         
         doc.save(self.doc_filename)
-        print(f"✅ Document generated: {self.doc_filename}")
+        logging.info("✅ Document generated: %s", self.doc_filename)
         
+    def _append_dependency_list(self, doc, dependencies):
+        """
+        Appends one paragraph per dependency (name/license, URL and versions
+        separated by line breaks). The paragraphs are built as a single XML
+        fragment and parsed once, instead of going through `add_paragraph`
+        three times per dependency.
+        """
+        paragraphs = []
+        for idx, dep in enumerate(dependencies, start=1):
+            lines = (
+                f"{idx}. {dep['package_name']} (License: {dep['license']['name']})",
+                f"   - License URL: {dep['license'].get('url', 'N/A')}",
+                f"   - Versions: {', '.join(dep['installed_versions'])}",
+            )
+            texts = LINE_BREAK_XML.join(TEXT_XML.format(text=escape(line)) for line in lines)
+            paragraphs.append(PARAGRAPH_XML.format(texts=texts))
+
+        fragment = parse_xml(BODY_XML.format(paragraphs="".join(paragraphs)))
+
+        # Section properties must stay the last child of the body
+        body = doc.element.body
+        sect_pr = body.sectPr
+        body.extend(list(fragment))
+        if sect_pr is not None:
+            body.append(sect_pr)
+
+    def generate_markdown(self, dependencies=None):
+        """
+        Writes the declaration as Markdown, using plain string writes only.
+        Returns the path of the Markdown file.
+        """
+        if dependencies is None:
+            dependencies = self.load_dependencies()
+
+        app = f"**{self.app_name}**"
+        contact = f"**{self.company_name}** at **{self.company_email}**."
+
+        buf = io.StringIO()
+        buf.write(f"**{self.company_name} - {self.app_name}**\n\n")
+        buf.write("# Open Source Declaration\n\n")
+        buf.write(
+            f"This document contains information about the open-source software components used in {app}. "
+            "It includes details of the applicable licenses, acknowledgments required by the respective licensors, "
+            "and information on obtaining the source code (where applicable). This list of open-source code has been "
+            f"compiled by reference to third-party software incorporated into the {app} "
+            "as of the date the list was created. Therefore, this list may be updated from time to time.\n\n"
+            f"All information herein is provided \"as is\". {app} "
+            "and its suppliers make no warranties, express or implied, regarding this list and its accuracy and completeness "
+            "or the results that may be obtained from the use or distribution of the list. By using or distributing this list, "
+            f"you agree that in no event shall {app} "
+            "be liable for any damages resulting from any use or distribution of this list, including, without this list being "
+            "exclusive, special, consequential, incidental, or any other direct or indirect damages.\n\n"
+        )
+
+        buf.write("## Open Source Components and Licenses\n\n")
+        for idx, dep in enumerate(dependencies, start=1):
+            buf.write(
+                f"{idx}. {dep['package_name']} (License: {dep['license']['name']})\n"
+                f"   - License URL: {dep['license'].get('url', 'N/A')}\n"
+                f"   - Versions: {', '.join(dep['installed_versions'])}\n"
+            )
+
+        buf.write("\n## How to Obtain Source Code\n\n")
+        buf.write(f"For components where the license requires providing source code, contact {contact}\n\n")
+        buf.write("## Acknowledgments\n\n")
+        buf.write("This product includes software developed by various open-source contributors.\n\n")
+        buf.write("## Additional Information\n\n")
+        buf.write(
+            f"{app} is committed to supporting the open-source community and complying with all applicable open-source licenses. "
+            "We are grateful to the developers and contributors of these open-source projects that have made this product possible.\n\n"
+            "For full source code and further information about the open-source components used in this product, "
+            f"please contact {contact}\n"
+        )
+
+        with open(self.markdown_filename, "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
+        logging.info("✅ Markdown generated: %s", self.markdown_filename)
+        return self.markdown_filename
+
     def run(self):
-        """Executes the document generation process."""
-        self.generate_document()
\ No newline at end of file
+        """
+        Executes the document generation process. Large dependency lists are
+        written as Markdown and converted to DOCX with a single pandoc call.
+        """
+        dependencies = self.load_dependencies()
+        if len(dependencies) < MARKDOWN_THRESHOLD:
+            self.generate_document(dependencies)
+            return
+
+        markdown_path = self.generate_markdown(dependencies)
+        if shutil.which("pandoc") is None:
+            logging.warning("⚠️ pandoc not found, the declaration is only available as Markdown: %s", markdown_path)
+            return
+
+        try:
+            subprocess.run(["pandoc", markdown_path, "-o", self.doc_filename], check=True)
+            logging.info("✅ Document generated: %s", self.doc_filename)
+        except subprocess.CalledProcessError as e:
+            logging.error("❌ pandoc failed (%s), the declaration is only available as Markdown: %s", e, markdown_path)
\ No newline at end of file
@@ -1,61 +1,357 @@
 import os
-import json
+import asyncio
 import logging
+import orjson
 import re
 from dotenv import load_dotenv
-from langchain_community.chat_models import ChatOpenAI
-from langchain.chains import LLMChain
-from prompts.standardization_prompt import get_standardization_prompt  # ✅ Make sure it has input_variables=["dependencies"]
+from agents.llm import LLM_MODEL, get_llm
+from agents.llm_cache import LLMCache
+from agents.fs_utils import write_bytes_atomic
+from prompts.standardization_prompt import PROMPT_VERSION, format_standardization_prompt
+
+try:
+    import ijson
+except ImportError:  # Without ijson, LLM responses are buffered and parsed in one go
+    ijson = None
 
 # Load environment variables
 load_dotenv()
 
+# Dependencies (counting nested ones) sent to the LLM per request, and requests in flight at once
+STANDARDIZATION_CHUNK_SIZE = 50
+STANDARDIZATION_CONCURRENCY = 8
+
+# Cleanup patterns for LLM JSON output, compiled once
+TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+STRING_VERSIONS_RE = re.compile(r'"installed_versions":\s*"([^"]+)"')
+
+# Fields every standardized record must have before it is handed to other agents
+RECORD_FIELDS = ("key", "package_name", "installed_versions", "is_transitive")
+
+def _prune_empty(node):
+    """
+    Returns a compact copy of an extracted dependency (or list of them) for the
+    LLM prompt: empty values such as `"dependencies": []` are dropped and
+    single-version lists are collapsed to the version itself.
+    """
+    if isinstance(node, list):
+        return [_prune_empty(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    pruned = {}
+    for field, value in node.items():
+        if value is None or value == [] or value == {}:
+            continue
+        if field == "installed_versions" and isinstance(value, list) and len(value) == 1:
+            value = value[0]
+        pruned[field] = _prune_empty(value)
+    return pruned
+
+def _count_packages(dep) -> int:
+    """Returns the number of packages in an extracted dependency, including nested `dependencies`."""
+    count = 0
+    stack = [dep]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, dict) and isinstance(node.get("dependencies"), list):
+            stack.extend(node["dependencies"])
+    return count
+
+def _partition(dependencies: list, chunk_size: int) -> list:
+    """
+    Splits top-level dependencies into chunks of about `chunk_size` packages,
+    nested ones included, so a single large subtree does not make one request
+    much slower than the others. Subtrees are never split across chunks.
+    """
+    chunks = []
+    chunk = []
+    size = 0
+    for dep in dependencies:
+        dep_size = _count_packages(dep)
+        if chunk and size + dep_size > chunk_size:
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(dep)
+        size += dep_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
 class StandardizedOutputAgent:
     """
-    Takes in extracted dependency data and consolidates it using an LLM.
+    Takes in extracted dependency data and consolidates it into a flat list of
+    unique packages, either deterministically (the default) or using an LLM.
     Writes output to `.shed/dependencies.json`.
     """
 
-    def __init__(self, repo_path: str, language: str, dependencies: list, use_chat_model=True):
-        self.repo_path = repo_path
+    def __init__(
+        self,
+        repo_path: str | os.PathLike,
+        language: str,
+        dependencies: list,
+        use_chat_model=False,
+        cache_path: str | os.PathLike = None,
+        dependencies_json: bytes = None
+    ):
+        """
+        :param repo_path: Repository whose `.shed` directory receives the output
+        :param language: Detected repository language
+        :param dependencies: Extracted dependencies to standardize
+        :param use_chat_model: Standardize with the LLM instead of `_normalize`
+        :param cache_path: SQLite file caching LLM standardization results across
+            runs (defaults to `.shed/llm_cache.db` in the repository)
+        :param dependencies_json: `dependencies` already serialized with
+            `orjson.OPT_SORT_KEYS`, if the caller has it (serialized on demand otherwise)
+        """
+        self.repo_path = os.fspath(repo_path)
         self.language = language
         self.dependencies = dependencies
         self.use_chat_model = use_chat_model
-        self.llm = ChatOpenAI(model_name="gpt-4", temperature=0)
+        self.dependencies_json = dependencies_json
+        self.record_queue = None
 
-        # ✅ Load the prompt template (with input_variables=["dependencies"] in its definition)
-        self.prompt_template = get_standardization_prompt()
+        if use_chat_model:
+            self.llm = get_llm()
+            self.cache = LLMCache(cache_path or os.path.join(self.repo_path, ".shed", "llm_cache.db"))
 
     def run(self) -> None:
+        """
+        Consolidates and writes dependency data to `.shed/dependencies.json`.
+        Blocking wrapper around `arun`.
+        """
+        asyncio.run(self.arun())
+
+    async def arun(self, record_queue: asyncio.Queue = None) -> None:
         """
         Consolidates and writes dependency data to `.shed/dependencies.json`
+        without blocking the event loop, so it can run alongside other agents.
+
+        With `record_queue`, every standardized record is also put on the queue
+        as soon as it is available (while the LLM is still streaming), followed
+        by a None sentinel once standardization has finished or failed.
+        """
+        self.record_queue = record_queue
+        try:
+            if self.use_chat_model:
+                standardized_dependencies = await self._acached_process_with_llm()
+            else:
+                standardized_dependencies = await asyncio.to_thread(self._normalize)
+                self._emit_all(standardized_dependencies)
+        finally:
+            if record_queue is not None:
+                record_queue.put_nowait(None)
+
+        await asyncio.to_thread(self._write_output, standardized_dependencies)
+
+    def _emit(self, record: dict) -> None:
+        """
+        Puts a standardized record on `record_queue`, if one is attached.
+        Records missing one of RECORD_FIELDS are not passed on.
+        """
+        if self.record_queue is None:
+            return
+        if not isinstance(record, dict) or any(field not in record for field in RECORD_FIELDS):
+            logging.warning("⚠️ Incomplete standardized record not passed on: %s", record)
+            return
+        self.record_queue.put_nowait(record)
+
+    def _emit_all(self, records: list) -> None:
+        """Puts every record of `records` on `record_queue`."""
+        for record in records:
+            self._emit(record)
+
+    def _normalize(self) -> list:
+        """
+        Consolidates dependencies into the standardized format without an LLM.
+
+        Accepts flat extractor rows (`key`/`package_name`/`installed_versions`/
+        `is_transitive`, or `name`/`version`) as well as nested trees with
+        `dependencies` lists. Entries are unique by `key` + `package_name`,
+        versions are grouped, and a package is transitive if it appears inside
+        any `dependencies` list.
         """
-        standardized_dependencies = self._process_with_llm()
-        self._write_output(standardized_dependencies)
+        logging.info("🧮 Normalizing dependencies...")
+        seen = {}
+
+        # (node, depth) pairs, walked depth-first with an explicit stack
+        stack = [(dep, 0) for dep in reversed(self.dependencies)]
+        while stack:
+            node, depth = stack.pop()
+            package_name = node.get("package_name") or node.get("name") or node.get("key", "unknown")
+            key = node.get("key") or package_name.lower()
+            versions = node.get("installed_versions")
+            if versions is None:
+                versions = [node.get("installed_version") or node.get("version", "unknown")]
+            elif isinstance(versions, str):
+                versions = [versions]
+            is_transitive = depth > 0 or bool(node.get("is_transitive", False))
+
+            entry = seen.get((key, package_name))
+            if entry is None:
+                seen[(key, package_name)] = {
+                    "key": key,
+                    "package_name": package_name,
+                    "installed_versions": list(dict.fromkeys(versions)),
+                    "is_transitive": is_transitive
+                }
+            else:
+                entry["installed_versions"].extend(
+                    version for version in versions if version not in entry["installed_versions"]
+                )
+                entry["is_transitive"] = entry["is_transitive"] or is_transitive
+
+            stack.extend((child, depth + 1) for child in reversed(node.get("dependencies") or ()))
+
+        logging.info("✅ Normalized %s unique dependencies.", len(seen))
+        return list(seen.values())
 
-    def _process_with_llm(self) -> list:
+    async def _acached_process_with_llm(self) -> list:
+        """
+        Returns the cached LLM standardization for this exact language,
+        dependency list, model and prompt version, running the LLM on a miss.
+        """
+        cache_key = LLMCache.make_key(
+            LLM_MODEL,
+            PROMPT_VERSION,
+            self.language,
+            (self.dependencies_json or orjson.dumps(self.dependencies, option=orjson.OPT_SORT_KEYS)).decode()
+        )
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logging.info("♻️ Using cached standardized dependencies")
+            self._emit_all(cached)
+            return cached
+
+        standardized_dependencies = await self._aprocess_with_llm()
+        if standardized_dependencies:
+            self.cache.set(cache_key, standardized_dependencies)
+        return standardized_dependencies
+
+    async def _aprocess_with_llm(
+        self,
+        chunk_size: int = STANDARDIZATION_CHUNK_SIZE,
+        concurrency: int = STANDARDIZATION_CONCURRENCY
+    ) -> list:
         """
         Uses an LLM to consolidate dependencies into a structured format.
+        Splits the dependencies into chunks of about `chunk_size` packages
+        (whole top-level subtrees each, see `_partition`), standardizes the
+        chunks with parallel streaming LLM requests (at most `concurrency` at
+        once) and merges the results.
         """
         logging.info("🤖 Processing dependencies with LLM for standardization...")
-        # logging.debug(f"🔍 Raw dependency input: {json.dumps(self.dependencies, indent=2)}")
 
-        # Convert dependency data to JSON
-        input_data = json.dumps(self.dependencies, indent=2)
+        chunks = _partition(self.dependencies, chunk_size)
+        logging.info("Standardizing %s dependencies in %s chunks", len(self.dependencies), len(chunks))
+
+        # Convert each chunk to compact, key-sorted JSON without empty fields to save prompt tokens
+        prompts = [
+            format_standardization_prompt(orjson.dumps(_prune_empty(chunk), option=orjson.OPT_SORT_KEYS).decode())
+            for chunk in chunks
+        ]
 
         # ✅ Run LLM using the structured prompt
-        chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
-        response = chain.invoke({"dependencies": input_data})  # Pass the JSON string as 'dependencies'
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def standardize(prompt: str) -> list:
+            async with semaphore:
+                return await self._astream_chunk(prompt)
+
+        chunk_results = await asyncio.gather(*(standardize(prompt) for prompt in prompts))
+        return self._merge_chunks(chunk_results)
 
-        logging.debug(f"📨 LLM raw response before processing: {response}")
+    async def _astream_chunk(self, prompt: str) -> list:
+        """
+        Streams the LLM response for one chunk through an incremental JSON
+        parser, so records are parsed while the response is still being
+        generated. Text before the opening `[` and after the closing `]`
+        (e.g. markdown fences) is ignored. If the streamed text is not a
+        well-formed array, the full response is parsed with `_parse_response`.
+        """
+        if ijson is None:
+            response = await self.llm.ainvoke(prompt)
+            records = self._parse_response(response.content)
+            self._emit_all(records)
+            return records
+
+        events = ijson.sendable_list()
+        parser = ijson.parse_coro(events, use_float=True)
+        records = []
+        builder = None
+        response_text = []
+        pending = ""
+        started = complete = failed = False
+
+        async for chunk in self.llm.astream(prompt):
+            response_text.append(chunk.content)
+            if complete or failed:
+                continue
+
+            pending += chunk.content
+            if not started:
+                start = pending.find("[")
+                if start == -1:
+                    continue
+                pending, started = pending[start:], True
+
+            try:
+                parser.send(pending.encode())
+            except ijson.JSONError:
+                failed = True  # Unless the array was closed before the invalid text
+            pending = ""
+
+            # Build each array item from its parse events as soon as it is complete
+            for prefix, event, value in events:
+                if prefix == "" and event == "end_array":
+                    complete = True
+                    break
+                if builder is None and prefix == "item" and event == "start_map":
+                    builder = ijson.ObjectBuilder()
+                if builder is not None:
+                    builder.event(event, value)
+                    if prefix == "item" and event == "end_map":
+                        records.append(self._coerce_record(builder.value))
+                        self._emit(records[-1])
+                        builder = None
+            del events[:]
+            failed = failed and not complete
+
+        try:
+            parser.close()
+        except ijson.JSONError:
+            pass  # Trailing text after the array, or a truncated array (handled below)
+
+        if not complete:
+            logging.warning("⚠️ Streamed LLM output was not a complete JSON array, parsing the full response")
+            records = self._parse_response("".join(response_text))
+            self._emit_all(records)  # Records already emitted while streaming are merged by the consumer
+            return records
+
+        logging.debug("📨 Streamed %d standardized records from the LLM", len(records))
+        return records
+
+    def _coerce_record(self, record: dict) -> dict:
+        """
+        Ensures `installed_versions` is always a list, not a string.
+        """
+        if isinstance(record.get("installed_versions"), str):
+            record["installed_versions"] = [record["installed_versions"]]
+        return record
+
+    def _parse_response(self, response_text: str) -> list:
+        """
+        Parses the JSON array returned by the LLM for one chunk.
+        """
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("📨 LLM raw response before processing: %s", response_text)
 
         try:
             # ✅ Strip markdown artifacts from LLM output (```json ... ```), if any
-            response_text = response.get("text", "").strip()
+            response_text = response_text.strip()
             response_text = response_text.replace("```json", "").replace("```", "").strip()
 
-            # logging.debug(f"📩 Cleaned LLM output: {response_text}")
-
             # ✅ Extract JSON array by locating first '[' and last ']'
             json_start = response_text.find("[")
             json_end = response_text.rfind("]")
@@ -65,15 +361,36 @@ class StandardizedOutputAgent:
             # ✅ Ensure valid JSON structure before loading
             response_text = self._fix_json_issues(response_text)
 
-            standardized_data = json.loads(response_text)
+            standardized_data = orjson.loads(response_text)
 
-        except (json.JSONDecodeError, ValueError) as e:
-            logging.error(f"❌ JSON Parsing Error: {e}")
-            logging.error(f"🚨 Failed JSON Response: {response_text}")
+        except ValueError as e:  # orjson.JSONDecodeError is a ValueError
+            logging.error("❌ JSON Parsing Error: %s", e)
+            logging.error("🚨 Failed JSON Response: %s", response_text)
             standardized_data = []
 
         return standardized_data
 
+    def _merge_chunks(self, chunk_results) -> list:
+        """
+        Merges the standardized chunks, keeping `key` + `package_name` unique
+        across chunks: versions are unioned and a package is transitive if it
+        is transitive in any chunk it appears in, as in `_normalize`.
+        """
+        merged = {}
+        for chunk in chunk_results:
+            for dep in chunk:
+                identity = (dep.get("key"), dep.get("package_name"))
+                existing = merged.get(identity)
+                if existing is None:
+                    merged[identity] = dep
+                    continue
+                for version in dep.get("installed_versions", []):
+                    if version not in existing.setdefault("installed_versions", []):
+                        existing["installed_versions"].append(version)
+                existing["is_transitive"] = existing.get("is_transitive", False) or dep.get("is_transitive", False)
+
+        return list(merged.values())
+
     def _fix_json_issues(self, json_text: str) -> str:
         """
         Fixes common JSON formatting issues from LLM responses.
@@ -83,14 +400,10 @@ class StandardizedOutputAgent:
         """
 
         # ✅ Remove trailing commas before closing JSON lists or objects
-        json_text = re.sub(r",\s*([\]}])", r"\\1", json_text)
+        json_text = TRAILING_COMMA_RE.sub(r"\1", json_text)
 
         # ✅ Ensure `"installed_versions"` is always a list, not a string
-        json_text = re.sub(
-            r'"installed_versions":\s*"([^"]+)"',
-            r'"installed_versions": ["\\1"]',
-            json_text
-        )
+        json_text = STRING_VERSIONS_RE.sub(r'"installed_versions": ["\1"]', json_text)
 
         return json_text
 
@@ -98,12 +411,9 @@ class StandardizedOutputAgent:
         """
         Writes the standardized dependency data to `.shed/dependencies.json`
         """
-        shed_dir = os.path.join(self.repo_path, ".shed")
-        os.makedirs(shed_dir, exist_ok=True)
-        output_path = os.path.join(shed_dir, "dependencies.json")
+        output_path = os.path.join(self.repo_path, ".shed", "dependencies.json")
 
-        logging.info(f"💾 Writing standardized dependencies to {output_path}...")
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        logging.info("💾 Writing standardized dependencies to %s...", output_path)
+        write_bytes_atomic(output_path, orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
         logging.info("✅ Dependencies successfully written to file.")
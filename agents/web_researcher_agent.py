@@ -1,127 +1,364 @@
-import json
+import os
+import asyncio
+import orjson
 import logging
-import re
-from langchain_community.chat_models import ChatOpenAI
+import importlib.util
+from typing import Optional
+import httpx
+from langchain_core.prompts import PromptTemplate
+from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
-from langchain.agents import initialize_agent
-from langchain.tools import TavilySearchResults
-from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel, Field
+from tavily import AsyncTavilyClient
+from openai import RateLimitError
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+from agents.fs_utils import write_bytes_atomic
+from agents.llm import LLM_MODEL, get_llm
+from agents.llm_cache import LLMCache, SemanticCache
+from agents.license_registry import license_url, lookup_license
 
 # Load environment variables
 load_dotenv()
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Bump whenever the research prompt changes so stale cached answers are not reused
+RESEARCH_PROMPT_VERSION = "v3"
+
+# Maximum number of dependencies researched at the same time
+RESEARCH_CONCURRENCY = 32
+
+# Timeout (seconds) for PyPI / npm registry metadata requests
+REGISTRY_TIMEOUT = 10.0
+
+# Registry requests share one pooled client for the agent's lifetime; HTTP/2 multiplexes
+# them over a few connections when the optional `h2` package (httpx[http2]) is installed
+REGISTRY_LIMITS = httpx.Limits(max_connections=RESEARCH_CONCURRENCY, max_keepalive_connections=RESEARCH_CONCURRENCY)
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Up to SEARCH_BATCH_SIZE pending web searches arriving within SEARCH_BATCH_WINDOW
+# seconds of each other are sent to Tavily as one compound query
+SEARCH_BATCH_SIZE = 10
+SEARCH_BATCH_WINDOW = 0.05
+SEARCH_RESULTS_PER_PACKAGE = 3
+
 # Configure logging to store logs in a file
 LOG_FILE = "web_researcher_agent.log"
 logging.basicConfig(
     filename=LOG_FILE,
     filemode='a',
     format="%(asctime)s - %(levelname)s - %(message)s",
-    level=logging.DEBUG
+    level=os.environ.get("LOGLEVEL", "INFO").upper()
+)
+
+# Research prompt, parsed once at import
+RESEARCH_PROMPT = PromptTemplate.from_template(
+    "Using the web search results below, determine for the given package:"
+    "\n- Whether it is open-source."
+    "\n- The software license (SPDX identifier if available, else a recognized name)."
+    "\n\nSearch results:\n{snippets}"
+    "\n\nPackage Name: {package_name}"
 )
 
-def _clean_llm_response(response_text: str) -> str:
-    """Cleans LLM response by stripping markdown artifacts and extracting JSON content."""
-    response_text = response_text.strip()
-    
-    # Remove markdown formatting (```json ... ```)
-    response_text = re.sub(r"```json\s*", "", response_text)
-    response_text = re.sub(r"```", "", response_text)
-    
-    return response_text
+class License(BaseModel):
+    """License details extracted for a package."""
+    name: str = Field(description="SPDX identifier if available, else a recognized license name")
+    url: Optional[str] = Field(default=None, description="URL of the official license page, only if stated in the search results")
+
+class LicenseInfo(BaseModel):
+    """Structured answer returned by the LLM for a single package."""
+    is_open_source: bool = Field(description="Whether the package is open-source")
+    license: License
+
+def _failed_research() -> dict:
+    """Research result used when no license could be determined for a package."""
+    return {
+        "is_open_source": False,
+        "license": {
+            "name": "AI failed to find the license",
+            "url": None
+        }
+    }
 
 class WebResearcherAgent:
     """
     An agent that verifies if dependencies are open-source and retrieves their license information.
     """
 
-    def __init__(self, dependencies: list):
-        self.dependencies = dependencies
-        self.llm = ChatOpenAI(model_name="gpt-4", temperature=0)
-        self.search_tool = TavilySearchResults()
-        
-        # Initialize agent with Tavily as a tool
-        self.agent = initialize_agent(
-            tools=[self.search_tool],
-            llm=self.llm,
-            agent="zero-shot-react-description",
-            verbose=True
+    def __init__(
+        self,
+        dependencies: Optional[list] = None,
+        language: Optional[str] = None,
+        cache_path: str | os.PathLike = os.path.join(".shed", "llm_cache.db"),
+        semantic_cache_path: str | os.PathLike = os.path.join(".shed", "sem_cache")
+    ):
+        """
+        :param dependencies: Dependencies researched by `arun` (`arun_stream`
+            reads them from a queue instead)
+        :param language: Detected repository language, selects the package registry
+            (PyPI or npm) queried before falling back to web research
+        :param cache_path: SQLite file caching research results across runs
+        :param semantic_cache_path: File prefix of the embedding cache that matches
+            near-identical package names
+        """
+        self.dependencies = dependencies or []
+        self.language = language
+        self.llm = get_llm()
+        self.structured_llm = self.llm.with_structured_output(LicenseInfo)
+        self.research_chain = RESEARCH_PROMPT | self.structured_llm
+        self.cache = LLMCache(cache_path, ttl=30 * 86400)
+        self.semantic_cache = SemanticCache(
+            semantic_cache_path,
+            embed=OpenAIEmbeddings(model=EMBEDDING_MODEL).embed_query
         )
+        self.web_search = AsyncTavilyClient()
+        self.registry_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=REGISTRY_LIMITS,
+            timeout=REGISTRY_TIMEOUT,
+            follow_redirects=True
+        )
+
+    async def __aenter__(self) -> "WebResearcherAgent":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Closes the pooled registry client. Use `async with` on the agent to call it automatically."""
+        await self.registry_client.aclose()
 
     def run(self) -> list:
         """
-        Processes dependencies in batches, checks if they are open-source, and fetches license information.
+        Checks if dependencies are open-source and fetches license information.
+        Blocking wrapper around `arun`, closes the agent afterwards.
+        """
+        async def run_and_close() -> list:
+            async with self:
+                return await self.arun()
+
+        return asyncio.run(run_and_close())
+
+    async def arun(self, concurrency: int = RESEARCH_CONCURRENCY) -> list:
+        """
+        Researches all dependencies concurrently, with at most `concurrency`
+        lookups in flight at once.
+        """
+        logging.info("Total number of dependencies to be researched: %s", len(self.dependencies))
+        queue = asyncio.Queue()
+        for dep in self.dependencies:
+            queue.put_nowait(dep)
+        queue.put_nowait(None)
+        return await self.arun_stream(queue, concurrency)
+
+    async def arun_stream(self, queue: asyncio.Queue, concurrency: int = RESEARCH_CONCURRENCY) -> list:
+        """
+        Researches dependency records as they arrive on `queue` (until a None
+        sentinel), starting each package's lookup as soon as its first record
+        is received, with at most `concurrency` lookups in flight at once.
+        Records repeating a `key` + `package_name` are merged (versions unioned,
+        transitive if any record is).
         """
         logging.info("🔍 Researching dependencies...")
-        logging.info(f"Total number of dependencies to be researched: {len(self.dependencies)}")
-        processed_dependencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def research(package_name: str, version: Optional[str]) -> dict:
+            async with semaphore:
+                return await self._research_dependency(package_name, version)
+
+        # Research each package name once, then fan the results back out to every row
+        dependencies = {}
+        research_tasks = {}
+        self.search_queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._search_batcher())
+        try:
+            while (dep := await queue.get()) is not None:
+                identity = (dep["key"], dep["package_name"])
+                existing = dependencies.get(identity)
+                if existing is None:
+                    dependencies[identity] = dep
+                else:
+                    dependencies[identity] = {
+                        **existing,
+                        "installed_versions": list(dict.fromkeys(
+                            [*existing["installed_versions"], *dep["installed_versions"]]
+                        )),
+                        "is_transitive": existing["is_transitive"] or dep["is_transitive"]
+                    }
 
-        # Define batch size
-        batch_size = 10  # Adjust this number based on your needs and system capabilities
-
-        # Process dependencies in batches
-        with ThreadPoolExecutor() as executor:
-            for i in range(0, len(self.dependencies), batch_size):
-                batch = self.dependencies[i:i + batch_size]
-                results = list(executor.map(self._research_dependency, [dep["package_name"] for dep in batch]))
-                
-                for dep, research_data in zip(batch, results):
-                    processed_dependencies.append({
-                        "key": dep["key"],
-                        "package_name": dep["package_name"],
-                        "installed_versions": dep["installed_versions"],
-                        "is_transitive": dep["is_transitive"],
-                        "is_open_source": research_data.get("is_open_source", False),
-                        "license": research_data.get("license", {"name": "Unknown", "version": "Unknown", "url": None})
-                    })
+                if dep["package_name"] not in research_tasks:
+                    # The registry is asked about the last version listed in the first record seen
+                    version = dep["installed_versions"][-1] if dep["installed_versions"] else None
+                    research_tasks[dep["package_name"]] = asyncio.create_task(research(dep["package_name"], version))
+
+            logging.info("Unique package names to research: %s", len(research_tasks))
+            results = await asyncio.gather(*research_tasks.values(), return_exceptions=True)
+        finally:
+            batcher.cancel()
+            for task in research_tasks.values():
+                task.cancel()
+
+        research_by_name = {}
+        for name, research_data in zip(research_tasks, results):
+            if isinstance(research_data, Exception):
+                logging.error("❌ Research failed for %s: %s", name, research_data)
+                research_data = _failed_research()
+            research_by_name[name] = research_data
+
+        processed_dependencies = []
+        for dep in dependencies.values():
+            research_data = research_by_name[dep["package_name"]]
+            processed_dependencies.append({
+                "key": dep["key"],
+                "package_name": dep["package_name"],
+                "installed_versions": dep["installed_versions"],
+                "is_transitive": dep["is_transitive"],
+                "is_open_source": research_data.get("is_open_source", False),
+                "license": research_data.get("license", {"name": "Unknown", "version": "Unknown", "url": None})
+            })
 
         return processed_dependencies
 
-    def _research_dependency(self, package_name: str) -> dict:
-        """
-        Uses LLM with Tavily as a tool to determine if a package is open-source and extract its license.
-        """
-        logging.info(f"🌎 Researching: {package_name}")
-        
-        research_prompt = (
-            "Analyze the given package name and determine:"
-            "\n- Whether it is open-source (respond with true or false)."
-            "\n- The software license (SPDX identifier if available, else a recognized name)."
-            "\n- A URL to the official license page if available."
-            "\n\nUse the WebSearch tool to search for relevant information about the package."
-            "\nRespond in JSON format:"
-            "```json"
-            "{"
-            "  \"is_open_source\": <true/false>,"
-            "  \"license\": {"
-            "    \"name\": \"<Extracted License Name or SPDX>\","
-            "    \"url\": \"<License URL if available>\""
-            "  }"
-            "}"
-            "```"
+    async def _research_dependency(self, package_name: str, version: Optional[str] = None) -> dict:
+        """
+        Reads the license declared in the package registry (PyPI / npm) first,
+        for the installed `version` when it is known.
+        Only when the registry has no recognizable open-source license does it
+        search the web with Tavily once and ask the LLM for a structured answer.
+        Successful results are cached, so each package is only researched once.
+        Rate-limited LLM calls are retried with exponential backoff.
+        """
+        cache_key = LLMCache.make_key(LLM_MODEL, RESEARCH_PROMPT_VERSION, package_name)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logging.info("♻️ Using cached research for: %s", package_name)
+            return cached
+
+        registry_data = await lookup_license(self.registry_client, self.language, package_name, version)
+        if registry_data is not None:
+            logging.info("📦 Using registry license for: %s", package_name)
+            self.cache.set(cache_key, registry_data)
+            return registry_data
+
+        # Fall back to a similar, previously researched package (one embedding call)
+        similar, embedding = await asyncio.to_thread(
+            self.semantic_cache.lookup, f"{package_name} package license"
+        )
+        if similar is not None:
+            logging.info("♻️ Using research of a similar package for: %s", package_name)
+            return similar
+
+        logging.info("🌎 Researching: %s", package_name)
+
+        search_results = await self._search(package_name)
+        snippets = "\n".join(
+            f"- {result['title']} ({result['url']}): {result['content']}"
+            for result in search_results
         )
-        
-        response = self.agent.run(f"{research_prompt}\nPackage Name: {package_name}")
-        logging.debug(f"LLM Research Response ({package_name}): {response}")
-        
+
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception_type(RateLimitError),
+            wait=wait_exponential(multiplier=1, max=60),
+            stop=stop_after_attempt(5),
+            reraise=True
+        ):
+            with attempt:
+                license_info = await self.research_chain.ainvoke({"snippets": snippets, "package_name": package_name})
+
+        research_data = license_info.model_dump()
+        # Known SPDX licenses get their canonical URL locally instead of the LLM's
+        research_data["license"]["url"] = license_url(
+            research_data["license"]["name"], research_data["license"]["url"]
+        )
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("LLM Research Response (%s): %s", package_name, research_data)
+
+        self.cache.set(cache_key, research_data)
+        self.semantic_cache.add(embedding, research_data)
+        return research_data
+
+    async def _search(self, package_name: str) -> list:
+        """
+        Returns Tavily search results about the license of a package. Searches
+        are queued for `_search_batcher` and cached per package name.
+        """
+        cache_key = LLMCache.make_key("tavily", package_name)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        future = asyncio.get_running_loop().create_future()
+        await self.search_queue.put((package_name, future))
+        search_results = await future
+
+        self.cache.set(cache_key, search_results)
+        return search_results
+
+    async def _search_batcher(self) -> None:
+        """
+        Drains the search queue, grouping up to SEARCH_BATCH_SIZE names that
+        arrive within SEARCH_BATCH_WINDOW seconds into one batch. Batches are
+        searched in the background so the next batch can be collected meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        in_flight = set()
+        while True:
+            batch = [await self.search_queue.get()]
+            deadline = loop.time() + SEARCH_BATCH_WINDOW
+            while len(batch) < SEARCH_BATCH_SIZE:
+                try:
+                    batch.append(await asyncio.wait_for(self.search_queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+
+            task = asyncio.create_task(self._search_batch(batch))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+    async def _search_batch(self, batch: list) -> None:
+        """
+        Runs one compound Tavily query for a batch of `(package_name, future)`
+        pairs and attributes the results to each name by substring match.
+        Names without any matching result get an individual search.
+        """
+        names = [name for name, _ in batch]
         try:
-            cleaned_response = _clean_llm_response(response)
-            parsed_response = json.loads(cleaned_response)
-            return parsed_response
-        except json.JSONDecodeError:
-            logging.error(f"❌ Failed to parse LLM response for {package_name}: {cleaned_response}")
-            return {
-                "is_open_source": False,
-                "license": {
-                    "name": "AI failed to find the license",
-                    "url": None
-                }
-            }
-
-    def save_output(self, data: list, output_path: str) -> None:
-        """
-        Saves the processed dependency data as a JSON file.
-        """
-        logging.info(f"💾 Saving research results to {output_path}...")
-        with open(output_path, "w") as f:
-            json.dump(data, f, indent=2)
+            results_by_name = {name: [] for name in names}
+            if len(names) > 1:
+                response = await self.web_search.search(
+                    query="license SPDX " + " OR ".join(names),
+                    max_results=min(20, SEARCH_RESULTS_PER_PACKAGE * len(names))
+                )
+                for result in response.get("results", []):
+                    text = f"{result['title']} {result['url']} {result['content']}".lower()
+                    for name in names:
+                        if name.lower() in text and len(results_by_name[name]) < SEARCH_RESULTS_PER_PACKAGE:
+                            results_by_name[name].append(result)
+
+            unattributed = [name for name in names if not results_by_name[name]]
+            responses = await asyncio.gather(*(
+                self.web_search.search(query=f"{name} license SPDX", max_results=SEARCH_RESULTS_PER_PACKAGE)
+                for name in unattributed
+            ))
+            for name, response in zip(unattributed, responses):
+                results_by_name[name] = response.get("results", [])
+
+            for name, future in batch:
+                if not future.done():
+                    future.set_result([
+                        {"title": result["title"], "url": result["url"], "content": result["content"]}
+                        for result in results_by_name[name]
+                    ])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def save_output(self, data: list, output_path: str | os.PathLike) -> None:
+        """
+        Saves the processed dependency data as a JSON file, atomically.
+        """
+        logging.info("💾 Saving research results to %s...", output_path)
+        write_bytes_atomic(output_path, orjson.dumps(data, option=orjson.OPT_INDENT_2))
         logging.info("✅ Research results saved.")
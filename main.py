@@ -1,136 +1,275 @@
 import argparse
+import asyncio
+import hashlib
 import os
 import sys
+import socket
 import subprocess
 import logging
-from dotenv import load_dotenv
+import time
+import orjson
+from pathlib import Path
 
-from agents.language_detection_agent import LanguageDetectionAgent
-from agents.dependency_extraction_agent import DependencyExtractionAgent
-from agents.standardized_output_agent import StandardizedOutputAgent
-from agents.web_researcher_agent import WebResearcherAgent
-from agents.open_source_doc_generator import OpenSourceDocGenerator
+from agents.fs_utils import write_bytes_atomic
 
-# Load environment variables from .env
-load_dotenv()
+# Agent modules (and langchain, pygments, docx...) are imported inside
+# orchestrate_workflow, so `--help` and early error exits start quickly
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+
+# Load environment variables from .env (python-dotenv is only imported when there is one)
+ENV_FILES = [path for path in (Path(".env"), PROJECT_ROOT / ".env") if path.exists()]
+if ENV_FILES:
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILES[0])
 
 logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
-    level=logging.DEBUG  
+    level=os.environ.get("LOGLEVEL", "INFO").upper()
 )
 
-PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
-DOCKERFILE_PATH = os.path.join(PROJECT_ROOT, "Dockerfiles", "unified.Dockerfile")
+DOCKERFILE_PATH = PROJECT_ROOT / "Dockerfiles" / "unified.Dockerfile"
 IMAGE_NAME = "multi-agent-runtime"
 
+# Image label holding a hash of the Dockerfile it was built from, so the image
+# is only rebuilt when the Dockerfile content changes (not on checkout/pull)
+DOCKERFILE_HASH_LABEL = "shed.dockerfile-sha"
+
+# Optional registry image (e.g. "ghcr.io/org/multi-agent-runtime:cache") whose
+# inline BuildKit cache is reused by `docker build`, for CI machines without a local image
+BUILD_CACHE_REF = os.getenv("SHED_BUILD_CACHE_REF")
+
+# The resolved image ID is cached here so most runs skip the Docker check entirely
+IMAGE_ID_CACHE_PATH = Path.home() / ".cache" / "multi-agent" / "image_id"
+IMAGE_ID_CACHE_TTL = 24 * 3600
+
+# Seconds to wait when probing the local Docker daemon socket
+DOCKER_SOCKET_TIMEOUT = 0.2
+
+
+def _dockerfile_hash() -> str:
+    """Returns a short BLAKE2b hash of the Dockerfile's content."""
+    return hashlib.blake2b(DOCKERFILE_PATH.read_bytes(), digest_size=16).hexdigest()
+
 
-def check_docker_running():
-    """Check if Docker is running; if not, prompt user and exit."""
+def _read_cached_image_id(dockerfile_hash: str):
+    """
+    Returns the cached image ID if it is younger than IMAGE_ID_CACHE_TTL and
+    was resolved for the current Dockerfile hash, else None.
+    """
     try:
-        subprocess.run(
-            ["docker", "info"], 
-            stdout=subprocess.DEVNULL, 
-            stderr=subprocess.DEVNULL, 
-            check=True
-        )
-        logging.info("✅ Docker is running.")
-    except subprocess.CalledProcessError:
-        logging.error("❌ Docker is not running. Please start Docker and try again.")
+        if time.time() - IMAGE_ID_CACHE_PATH.stat().st_mtime > IMAGE_ID_CACHE_TTL:
+            return None
+        image_id, _, cached_hash = IMAGE_ID_CACHE_PATH.read_text().strip().partition(" ")
+        return image_id if image_id and cached_hash == dockerfile_hash else None
+    except OSError:
+        return None
+
+
+def _write_cached_image_id(image_id: str, dockerfile_hash: str) -> None:
+    """Atomically stores the resolved image ID and its Dockerfile hash in IMAGE_ID_CACHE_PATH."""
+    write_bytes_atomic(IMAGE_ID_CACHE_PATH, f"{image_id} {dockerfile_hash}".encode())
+
+
+def _docker_daemon_reachable():
+    """
+    Probes the Docker daemon's unix socket (DOCKER_HOST or /var/run/docker.sock)
+    without starting a `docker` process. Returns True or False, or None when
+    there is no local socket to probe (Windows, remote hosts, other contexts).
+    Only a True result is acted on; the `docker` CLI has the final word.
+    """
+    host = os.environ.get("DOCKER_HOST", "unix:///var/run/docker.sock")
+    if not host.startswith("unix://") or not hasattr(socket, "AF_UNIX"):
+        return None
+    socket_path = host[len("unix://"):]
+    if not os.path.exists(socket_path):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(DOCKER_SOCKET_TIMEOUT)
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def ensure_docker_and_image():
+    """
+    Checks that Docker is running and that the runtime image exists and was
+    built from the current Dockerfile (per its DOCKERFILE_HASH_LABEL),
+    (re)building it otherwise, with a single `docker image inspect` call. The cached image ID is only trusted when the
+    daemon socket probe didn't fail; a failed probe (stale socket file, no
+    permission, another docker context) falls through to the `docker` CLI.
+    """
+    if not DOCKERFILE_PATH.exists():
+        logging.error("❌ Dockerfile not found at %s. Please check your setup.", DOCKERFILE_PATH)
         sys.exit(1)
+    dockerfile_hash = _dockerfile_hash()
 
+    cached_image_id = _read_cached_image_id(dockerfile_hash)
+    if cached_image_id and _docker_daemon_reachable() is not False:
+        logging.info("✅ Docker image '%s' found (cached ID %s).", IMAGE_NAME, cached_image_id)
+        return
 
-def check_and_build_docker_image():
-    """Check if the Docker image exists; build it if not."""
     try:
         result = subprocess.run(
-            ["docker", "images", "-q", IMAGE_NAME],
+            [
+                "docker", "image", "inspect", IMAGE_NAME,
+                "--format", f'{{{{.Id}}}} {{{{index .Config.Labels "{DOCKERFILE_HASH_LABEL}"}}}}'
+            ],
             capture_output=True,
-            text=True,
-            check=True
+            text=False  # Raw bytes; only the image ID and Dockerfile hash label are ever decoded
         )
+    except FileNotFoundError:
+        logging.error("❌ Docker is not installed. Please install Docker and try again.")
+        sys.exit(1)
 
-        if not result.stdout.strip():
-            logging.info(f"🔎 Docker image '{IMAGE_NAME}' not found. Building...")
-            build_docker_image()
-        else:
-            logging.info(f"✅ Docker image '{IMAGE_NAME}' found.")
-
-    except subprocess.CalledProcessError as e:
-        logging.error(f"❌ Error checking Docker images: {e}")
+    if result.returncode == 0:
+        logging.info("✅ Docker is running.")
+        image_id, _, image_hash = result.stdout.decode().strip().partition(" ")
+        if image_hash != dockerfile_hash:
+            logging.info("🔁 Dockerfile changed since image '%s' was built. Rebuilding...", IMAGE_NAME)
+            build_docker_image(dockerfile_hash)
+            return
+        logging.info("✅ Docker image '%s' found.", IMAGE_NAME)
+        _write_cached_image_id(image_id, dockerfile_hash)
+    elif b"No such image" in result.stderr:
+        logging.info("✅ Docker is running.")
+        logging.info("🔎 Docker image '%s' not found. Building...", IMAGE_NAME)
+        build_docker_image(dockerfile_hash)
+    else:
+        # e.g. "Cannot connect to the Docker daemon"
+        logging.error(
+            "❌ Docker is not running. Please start Docker and try again.\n%s",
+            result.stderr.decode(errors="replace").strip()
+        )
         sys.exit(1)
 
 
-def build_docker_image():
-    """Build the Docker image from the provided Dockerfile."""
-    if not os.path.exists(DOCKERFILE_PATH):
-        logging.error(f"❌ Dockerfile not found at {DOCKERFILE_PATH}. Please check your setup.")
-        sys.exit(1)
+def build_docker_image(dockerfile_hash: str):
+    """
+    Build the Docker image from the provided Dockerfile with BuildKit, labelled
+    with the Dockerfile's hash. The image embeds its layer cache (inline
+    cache), so rebuilds after a Dockerfile change reuse the unchanged layers
+    of the previous image (or of BUILD_CACHE_REF).
+    """
+    cmd = [
+        "docker", "build",
+        "--build-arg", "BUILDKIT_INLINE_CACHE=1",
+        "--label", f"{DOCKERFILE_HASH_LABEL}={dockerfile_hash}",
+        "--cache-from", IMAGE_NAME,
+        "-t", IMAGE_NAME,
+        "-f", DOCKERFILE_PATH,
+    ]
+    if BUILD_CACHE_REF:
+        cmd += ["--cache-from", BUILD_CACHE_REF]
+    cmd.append(PROJECT_ROOT)
 
     try:
-        subprocess.run(
-            ["docker", "build", "-t", IMAGE_NAME, "-f", DOCKERFILE_PATH, PROJECT_ROOT],
-            check=True
-        )
-        logging.info(f"✅ Successfully built Docker image '{IMAGE_NAME}'.")
+        subprocess.run(cmd, env={**os.environ, "DOCKER_BUILDKIT": "1"}, check=True)
+        logging.info("✅ Successfully built Docker image '%s'.", IMAGE_NAME)
     except subprocess.CalledProcessError as e:
-        logging.error(f"❌ Failed to build Docker image: {e}")
+        logging.error("❌ Failed to build Docker image: %s", e)
         sys.exit(1)
 
 
-def orchestrate_workflow(repo_path: str, app_name: str) -> None:
-    """Orchestrates the multi-agent dependency extraction workflow."""
+async def orchestrate_workflow(repo_path: str | os.PathLike, app_name: str, llm_standardize: bool = False) -> None:
+    """
+    Orchestrates the multi-agent dependency extraction workflow. Standardization
+    and web research run concurrently: standardized records are streamed to the
+    researcher through a queue as soon as they are produced.
+    """
     logging.info("🚀 Starting Dependency Extraction...")
 
-    # 1️⃣ Check Docker is running
-    check_docker_running()
-
-    # 2️⃣ Ensure Docker image is built
-    check_and_build_docker_image()
+    # 1️⃣ + 2️⃣ Check Docker is running and ensure the Docker image is built
+    ensure_docker_and_image()
 
     # 3️⃣ Detect language
     logging.info("🔍 Detecting language...")
     try:
+        from agents.language_detection_agent import LanguageDetectionAgent
+
         detection_agent = LanguageDetectionAgent(repo_path)
         detection_output = detection_agent.run()
         language = detection_output["language"]
-        logging.info(f"✅ Detected language: {language}")
+        logging.info("✅ Detected language: %s", language)
     except Exception as e:
-        logging.error(f"❌ Language detection failed: {e}")
+        logging.error("❌ Language detection failed: %s", e)
         sys.exit(1)
 
     # 4️⃣ Dependency extraction
-    logging.info(f"📦 Extracting dependencies for {language} using Docker...")
+    logging.info("📦 Extracting dependencies for %s using Docker...", language)
     try:
+        from agents.dependency_extraction_agent import DependencyExtractionAgent
+
         extraction_agent = DependencyExtractionAgent(language, repo_path, docker_image=IMAGE_NAME)
         extraction_result = extraction_agent.run()
-        # logging.debug(f"⚙️ Extraction result object: {extraction_result}")
+        # logging.debug("⚙️ Extraction result object: %s", extraction_result)
     except Exception as e:
-        logging.error(f"❌ Dependency extraction error: {e}")
+        logging.error("❌ Dependency extraction error: %s", e)
+        # The image may have been removed since its ID was cached; check it again next run
+        IMAGE_ID_CACHE_PATH.unlink(missing_ok=True)
         sys.exit(1)
 
+    dependencies = extraction_result["dependencies"]
+    # Serialized once here for the LLM standardization cache key
+    dependencies_json = orjson.dumps(dependencies, option=orjson.OPT_SORT_KEYS) if llm_standardize else None
+
+    shed_dir = Path(repo_path) / ".shed"
+    record_queue = asyncio.Queue()
+
     # 5️⃣ Standardized Output Agent
-    logging.info("📑 Standardizing extracted dependencies with LLM...")
-    try:
-        output_agent = StandardizedOutputAgent(repo_path, language, extraction_result["dependencies"])
-        output_agent.run()
-    except Exception as e:
-        logging.error(f"❌ Standardization failed: {e}")
-        sys.exit(1)
+    async def standardize() -> None:
+        logging.info("📑 Standardizing extracted dependencies...")
+        try:
+            from agents.standardized_output_agent import StandardizedOutputAgent
+
+            output_agent = StandardizedOutputAgent(
+                repo_path,
+                language,
+                dependencies,
+                use_chat_model=llm_standardize,
+                cache_path=shed_dir / "llm_cache.db",
+                dependencies_json=dependencies_json
+            )
+        except Exception:
+            record_queue.put_nowait(None)  # Let the researcher finish with what it has
+            raise
+        await output_agent.arun(record_queue=record_queue)
 
     # 6️⃣ Web Researcher Agent
-    logging.info("🌎 Researching open-source status and licenses...")
-    try:
-        researcher_agent = WebResearcherAgent(extraction_result["dependencies"])
-        researched_dependencies = researcher_agent.run()
-        researcher_output_path = os.path.join(repo_path, ".shed", "open_source_dependencies.json")
+    async def research() -> Path:
+        logging.info("🌎 Researching open-source status and licenses...")
+        from agents.web_researcher_agent import WebResearcherAgent
+
+        async with WebResearcherAgent(
+            language=language,
+            cache_path=shed_dir / "llm_cache.db",
+            semantic_cache_path=shed_dir / "sem_cache"
+        ) as researcher_agent:
+            researched_dependencies = await researcher_agent.arun_stream(record_queue)
+        researcher_output_path = shed_dir / "open_source_dependencies.json"
         researcher_agent.save_output(researched_dependencies, researcher_output_path)
-    except Exception as e:
-        logging.error(f"❌ Web Researcher Agent failed: {e}")
+        return researcher_output_path
+
+    # Run both agents concurrently; a failure in one does not cancel the other
+    standardize_result, research_result = await asyncio.gather(
+        standardize(), research(), return_exceptions=True
+    )
+    if isinstance(standardize_result, Exception):
+        logging.error("❌ Standardization failed: %s", standardize_result)
+    if isinstance(research_result, Exception):
+        logging.error("❌ Web Researcher Agent failed: %s", research_result)
+    if isinstance(standardize_result, Exception) or isinstance(research_result, Exception):
         sys.exit(1)
+    researcher_output_path = research_result
 
     # 7️⃣ Generate Open Source Report ✅
     logging.info("📄 Generating Open Source Declaration document...")
 
+    from agents.open_source_doc_generator import OpenSourceDocGenerator
+
     doc_generator = OpenSourceDocGenerator(repo_path, researcher_output_path, app_name)
 
     doc_generator.run()
@@ -142,19 +281,24 @@ def main():
     parser = argparse.ArgumentParser(description="Multi-Agent Dependency Extractor")
     parser.add_argument("repo_path", help="Path to the local Git repository.")
     parser.add_argument("app_name", help="Name of the application.")
+    parser.add_argument(
+        "--llm-standardize",
+        action="store_true",
+        help="Standardize dependencies with the LLM instead of deterministic normalization."
+    )
     args = parser.parse_args()
 
     repo_path = os.path.abspath(args.repo_path)
     if not os.path.isdir(repo_path):
-        logging.error(f"❌ Error: {repo_path} is not a valid directory.")
+        logging.error("❌ Error: %s is not a valid directory.", repo_path)
         sys.exit(1)
 
-    logging.info(f"Application Name: {args.app_name}")
+    logging.info("Application Name: %s", args.app_name)
 
     try:
-        orchestrate_workflow(repo_path, args.app_name)
+        asyncio.run(orchestrate_workflow(repo_path, args.app_name, llm_standardize=args.llm_standardize))
     except Exception as e:
-        logging.error(f"❌ Process halted due to error: {e}")
+        logging.error("❌ Process halted due to error: %s", e)
         sys.exit(1)
 
 
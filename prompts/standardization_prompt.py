@@ -1,12 +1,9 @@
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
 
-def get_standardization_prompt() -> PromptTemplate:
-    """
-    Returns the prompt template for standardizing dependency extraction.
-    This version uses parentheses instead of braces in the sample, so there are no curly braces.
-    """
-    return PromptTemplate(
-        template="""
+# Bump whenever the template changes so cached standardization results are not reused
+PROMPT_VERSION = "v1"
+
+STANDARDIZATION_TEMPLATE = """
         **Task**:
         You are given a list of extracted dependencies from a software project. 
         Your job is to **standardize** the dependencies into a structured JSON format.
@@ -98,8 +95,31 @@ def get_standardization_prompt() -> PromptTemplate:
         ---
 
         Here are the extracted dependencies: {dependencies}
-        """,
-        input_variables=["dependencies"],
-        template_format="f-string",
-        validate_template=False
-    )
+        """
+
+# Text before and after the only variable, so prompts can be built by plain
+# concatenation without going through LangChain's template engine
+_HEAD, _TAIL = STANDARDIZATION_TEMPLATE.split("{dependencies}")
+
+# Parsed once at import; PromptTemplate is not mutated after construction
+_PROMPT = PromptTemplate(
+    template=STANDARDIZATION_TEMPLATE,
+    input_variables=["dependencies"],
+    template_format="f-string",
+    validate_template=False
+)
+
+def get_standardization_prompt() -> PromptTemplate:
+    """
+    Returns the prompt template for standardizing dependency extraction.
+    This version uses parentheses instead of braces in the sample, so there are no curly braces.
+    The template is built once at import, so this is a cheap accessor.
+    """
+    return _PROMPT
+
+def format_standardization_prompt(dependencies: str) -> str:
+    """
+    Returns the standardization prompt for the serialized `dependencies`,
+    the same text `get_standardization_prompt().format(dependencies=...)` produces.
+    """
+    return "".join((_HEAD, dependencies, _TAIL))
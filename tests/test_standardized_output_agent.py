@@ -0,0 +1,49 @@
+from agents.standardized_output_agent import _prune_empty
+
+
+def test_prune_empty_drops_empty_dependencies():
+    dep = {"name": "requests", "installed_versions": ["2.31.0"], "dependencies": []}
+
+    assert _prune_empty(dep) == {"name": "requests", "installed_versions": "2.31.0"}
+
+
+def test_prune_empty_drops_none_and_empty_dict_values():
+    dep = {"name": "requests", "license": None, "metadata": {}}
+
+    assert _prune_empty(dep) == {"name": "requests"}
+
+
+def test_prune_empty_collapses_single_installed_version():
+    assert _prune_empty({"installed_versions": ["1.0"]}) == {"installed_versions": "1.0"}
+
+
+def test_prune_empty_keeps_multiple_installed_versions():
+    dep = {"installed_versions": ["1.0", "2.0"]}
+
+    assert _prune_empty(dep) == {"installed_versions": ["1.0", "2.0"]}
+
+
+def test_prune_empty_keeps_false_is_transitive():
+    dep = {"name": "urllib3", "is_transitive": False, "dependencies": []}
+
+    assert _prune_empty(dep) == {"name": "urllib3", "is_transitive": False}
+
+
+def test_prune_empty_recurses_into_nested_dependencies():
+    deps = [
+        {
+            "name": "requests",
+            "installed_versions": ["2.31.0"],
+            "dependencies": [
+                {"name": "idna", "installed_versions": ["3.6"], "dependencies": []},
+            ],
+        },
+    ]
+
+    assert _prune_empty(deps) == [
+        {
+            "name": "requests",
+            "installed_versions": "2.31.0",
+            "dependencies": [{"name": "idna", "installed_versions": "3.6"}],
+        },
+    ]